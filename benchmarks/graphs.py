@@ -0,0 +1,110 @@
+"""
+graphs.py generates synthetic prairies of a given number of blocks, built from the functions of
+files/scripts/test_functions.py:
+
+- chain: input ---- add ---- multiply ---- add ---- ...
+- fan: input fanning out to wait blocks, gathered back by a binary tree of add blocks, the input value being the
+  duration of the waits
+- diamond: diamonds one after the other, each one being    ---- add ----
+                                                       ---<             >---- multiply ----
+                                                           ---- add ----
+- random: random DAG, each add or multiply block reading two blocks created before it
+
+Every builder returns the prairie, the list of its blocks in creation order, and the connections to make as
+(output node, input node) pairs, so that the calls to Prairie.connect_nodes can be timed apart from the creation of
+the blocks.
+"""
+
+import random
+
+from model.blocks import FunctionBlock, InputBlock
+from model.core import Prairie
+
+TEST_FUNCTIONS = 'files/scripts/test_functions.py'
+
+
+def output_node(block):
+    return list(block.nodes_out().values())[0]
+
+
+def binary(prairie: Prairie, function: str, x, y, connections: list) -> FunctionBlock:
+    """
+    Add a block of a two arguments function reading the first output node of two blocks
+
+    :param prairie: Prairie
+    :param function: 'add' or 'multiply'
+    :param x: block to connect to the argument x
+    :param y: block to connect to the argument y
+    :param connections: list of the connections to make, appended in place
+    :return: block created
+    """
+    block = FunctionBlock(TEST_FUNCTIONS, function, prairie=prairie)
+    connections.append((output_node(x), block.nodes_in()['x']))
+    connections.append((output_node(y), block.nodes_in()['y']))
+    return block
+
+
+def chain(size: int, value: str = '0'):
+    prairie = Prairie()
+    blocks = [InputBlock('input', value, prairie=prairie)]
+    connections = []
+
+    while len(blocks) < size:
+        function = 'add' if len(blocks) % 2 else 'multiply'
+        blocks.append(binary(prairie, function, blocks[-1], blocks[-1], connections))
+
+    return prairie, blocks, connections
+
+
+def fan(size: int, wait: float = 0.):
+    prairie = Prairie()
+    delay = InputBlock('delay', repr(wait), prairie=prairie)
+    blocks = [delay]
+    connections = []
+
+    # n waits and n - 1 adds
+    layer = []
+    for _ in range(max(1, size // 2)):
+        block = FunctionBlock(TEST_FUNCTIONS, 'wait', prairie=prairie)
+        connections.append((output_node(delay), block.nodes_in()['x']))
+        layer.append(block)
+    blocks += layer
+
+    while len(layer) > 1:
+        gathered = [binary(prairie, 'add', x, y, connections) for x, y in zip(layer[::2], layer[1::2])]
+        blocks += gathered
+        layer = gathered + layer[len(gathered) * 2:]
+
+    return prairie, blocks, connections
+
+
+def diamond(size: int, value: str = '0'):
+    prairie = Prairie()
+    blocks = [InputBlock('input', value, prairie=prairie)]
+    connections = []
+
+    while len(blocks) + 3 <= size:
+        top = blocks[-1]
+        left = binary(prairie, 'add', top, top, connections)
+        right = binary(prairie, 'add', top, top, connections)
+        blocks += [left, right, binary(prairie, 'multiply', left, right, connections)]
+
+    return prairie, blocks, connections
+
+
+def random_dag(size: int, value: str = '0', seed: int = 0):
+    prairie = Prairie()
+    blocks = [InputBlock('input', value, prairie=prairie)]
+    generator = random.Random(seed)
+    connections = []
+
+    while len(blocks) < size:
+        # Mostly recent blocks, so that the graph is deep as well as wide
+        x = blocks[max(0, len(blocks) - 1 - int(generator.expovariate(1 / 8)))]
+        y = generator.choice(blocks)
+        blocks.append(binary(prairie, generator.choice(['add', 'multiply']), x, y, connections))
+
+    return prairie, blocks, connections
+
+
+SHAPES = {'chain': chain, 'fan': fan, 'diamond': diamond, 'random': random_dag}
@@ -0,0 +1,144 @@
+"""
+Memory used by the model of the synthetic prairies of graphs.py, run from the root of the repository:
+
+    python -m benchmarks.memory --shapes chain random --sizes 1000 100000 --output memory.json
+
+For each shape and size, the memory allocated while the blocks are created and connected is measured with tracemalloc,
+and reported per block along with the number of nodes and connections. The plan is compiled once as well, the ids of
+the blocks, nodes and connections being generated when the prairie is saved:
+- model_bytes: blocks, nodes and connections
+- plan_bytes: the ExecutionPlan compiled from them
+- ids_bytes: the ids generated by serializer.describe_prairie
+
+With --ref, the same measures are taken on the tree of another commit, checked out in a temporary git worktree, and
+reported as the baseline of the current tree:
+
+    python -m benchmarks.memory --ref 1f5445f~1 --output memory.json
+
+memory_baseline.json holds the measures of the model before its objects were slimmed down.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+from benchmarks.graphs import SHAPES, TEST_FUNCTIONS
+from benchmarks.run import commit
+from model.compiler import functions, load_module
+from model.serializer import describe_prairie
+
+
+def measure(shape: str, size: int) -> dict:
+    """
+    Build one synthetic prairie and measure the memory it holds
+
+    :param shape: 'chain', 'fan', 'diamond' or 'random'
+    :param size: number of blocks
+    :return: dictionary of the measures
+    """
+    gc.collect()
+    tracemalloc.start()
+
+    start = tracemalloc.get_traced_memory()[0]
+    prairie, blocks, connections = SHAPES[shape](size)
+    for node_out, node_in in connections:
+        prairie.connect_nodes(node_out, node_in)
+    # The list of the connections to make is not part of the model
+    del connections
+    gc.collect()
+    built = tracemalloc.get_traced_memory()[0]
+
+    plan = prairie.plan()
+    planned = tracemalloc.get_traced_memory()[0]
+
+    describe_prairie(prairie)
+    gc.collect()
+    described = tracemalloc.get_traced_memory()[0]
+
+    tracemalloc.stop()
+
+    nodes = len(plan.nodes)
+    return {'shape': shape,
+            'blocks': len(blocks),
+            'nodes': nodes,
+            'connections': len(prairie.connections_id()),
+            'model_bytes': built - start,
+            'model_bytes_per_block': (built - start) / len(blocks),
+            'plan_bytes': planned - built,
+            'ids_bytes': described - planned,
+            'bytes_per_block': (described - start) / len(blocks)}
+
+
+def measure_ref(ref: str, argv: list) -> dict:
+    """
+    Run this benchmark on the tree of another commit, in a temporary git worktree, so that both trees are measured by
+    the same script
+
+    :param ref: commit, branch or tag
+    :param argv: arguments of the benchmark, without --ref and --output
+    :return: report of the benchmark on the tree of ref
+    """
+    directory = os.path.join(tempfile.mkdtemp(prefix='prairie-'), 'tree')
+    subprocess.run(['git', 'worktree', 'add', '--detach', directory, ref], stdout=subprocess.DEVNULL, check=True)
+    try:
+        shutil.copy(os.path.abspath(__file__), os.path.join(directory, 'benchmarks', 'memory.py'))
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.memory'] + argv, cwd=directory,
+                                stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+    finally:
+        subprocess.run(['git', 'worktree', 'remove', '--force', directory], check=False)
+        shutil.rmtree(os.path.dirname(directory), ignore_errors=True)
+
+    return json.loads(output)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='benchmarks.memory', description='Measure the memory used by the model')
+    parser.add_argument('--shapes', nargs='+', choices=sorted(SHAPES), default=sorted(SHAPES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000])
+    parser.add_argument('--output', metavar='FILE', help='write the results to FILE instead of stdout')
+    parser.add_argument('--ref', metavar='REF', help='measure the tree of the commit REF as well, as a baseline')
+    arguments = parser.parse_args(argv)
+
+    baseline = None
+    if arguments.ref is not None:
+        baseline = measure_ref(arguments.ref, ['--shapes'] + arguments.shapes +
+                               ['--sizes'] + [str(size) for size in arguments.sizes])
+
+    # Imported once beforehand, so that the first prairie measured does not account for the script
+    functions(TEST_FUNCTIONS)
+    load_module(TEST_FUNCTIONS)
+
+    results = []
+    for shape in arguments.shapes:
+        for size in arguments.sizes:
+            result = measure(shape, size)
+            print(shape, size, round(result['model_bytes_per_block']), 'bytes per block', file=sys.stderr)
+            results.append(result)
+
+    report = {'commit': commit(),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'cpu_count': os.cpu_count(),
+              'results': results}
+    if baseline is not None:
+        report['baseline'] = baseline
+
+    if arguments.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(arguments.output, 'w') as outfile:
+            json.dump(report, outfile, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
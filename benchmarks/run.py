@@ -0,0 +1,144 @@
+"""
+Benchmarks of the model and of the engine on the synthetic prairies of graphs.py, run from the root of the repository:
+
+    python -m benchmarks.run --shapes chain random --sizes 10 1000 100000 --output results.json
+
+For each shape and size, the following times are measured, in seconds:
+- blocks: creation of the blocks
+- connect: Prairie.connect_nodes for every connection
+- plan: compilation of the execution plan
+- run: Engine.run, the functions being no-ops (add and multiply of zeros, waits of 0 s by default), so that it measures
+  the overhead of the scheduler, also given per block in microseconds
+- end_to_end: from the creation of the blocks to the end of the run
+- delete: mean time of Prairie.delete_block, over blocks picked at random
+
+The results are written as JSON, along with the commit and the machine, to be compared between commits.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from benchmarks.graphs import SHAPES, TEST_FUNCTIONS
+from model.blocks import InputBlock
+from model.compiler import functions, load_module
+from model.engine import Engine
+
+
+def commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              universal_newlines=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(shape: str, size: int, workers: int = None, deletes: int = 100, wait: float = 0., fuse: bool = False,
+            seed: int = 0, array_graph: bool = False) -> dict:
+    """
+    Build and run one synthetic prairie
+
+    :param shape: 'chain', 'fan', 'diamond' or 'random'
+    :param size: number of blocks
+    :param workers: number of workers of the engine
+    :param deletes: number of blocks deleted once the prairie ran
+    :param wait: duration of the wait blocks of the fan shape, in seconds
+    :param fuse: run the engine with the fusion of the linear chains
+    :param seed: seed of the random choices
+    :param array_graph: run the engine with the ready inputs counted by an ArrayGraph
+    :return: dictionary of the measures
+    """
+    gc.collect()
+
+    start = time.perf_counter()
+    prairie, blocks, connections = SHAPES[shape](size, wait) if shape == 'fan' else SHAPES[shape](size)
+    created = time.perf_counter()
+
+    for node_out, node_in in connections:
+        prairie.connect_nodes(node_out, node_in)
+    connected = time.perf_counter()
+
+    levels = len(prairie.plan().levels)
+    planned = time.perf_counter()
+
+    engine = Engine(prairie, max_workers=workers, fuse=fuse, array_graph=array_graph)
+    for block in blocks:
+        if isinstance(block, InputBlock):
+            block.set_ready()
+    try:
+        engine.run()
+    finally:
+        engine.shutdown()
+    ran = time.perf_counter()
+
+    deleted = random.Random(seed).sample(blocks, min(deletes, len(blocks)))
+    delete_start = time.perf_counter()
+    for block in deleted:
+        prairie.delete_block(block)
+    delete_seconds = (time.perf_counter() - delete_start) / max(1, len(deleted))
+
+    return {'shape': shape,
+            'blocks': len(blocks),
+            'connections': len(connections),
+            'levels': levels,
+            'blocks_seconds': created - start,
+            'connect_seconds': connected - created,
+            'plan_seconds': planned - connected,
+            'run_seconds': ran - planned,
+            'run_microseconds_per_block': (ran - planned) / len(blocks) * 1e6,
+            'end_to_end_seconds': ran - start,
+            'delete_seconds': delete_seconds,
+            'errors': len(engine.errors)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='benchmarks.run', description='Benchmark the model and the engine')
+    parser.add_argument('--shapes', nargs='+', choices=sorted(SHAPES), default=sorted(SHAPES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument('--workers', type=int, help='number of workers of the engine')
+    parser.add_argument('--deletes', type=int, default=100, help='number of blocks deleted per prairie')
+    parser.add_argument('--wait', type=float, default=0., help='duration of the wait blocks, in seconds')
+    parser.add_argument('--fuse', action='store_true', help='fuse the linear chains of blocks')
+    parser.add_argument('--array-graph', action='store_true', help='count the ready inputs of the blocks in arrays')
+    parser.add_argument('--output', metavar='FILE', help='write the results to FILE instead of stdout')
+    arguments = parser.parse_args(argv)
+
+    # Imported once beforehand, so that the first prairie measured does not pay the import of the script
+    functions(TEST_FUNCTIONS)
+    load_module(TEST_FUNCTIONS)
+
+    results = []
+    for shape in arguments.shapes:
+        for size in arguments.sizes:
+            result = measure(shape, size, arguments.workers, arguments.deletes, arguments.wait, arguments.fuse,
+                             array_graph=arguments.array_graph)
+            print(shape, size, 'run', round(result['run_seconds'], 3), 's', file=sys.stderr)
+            results.append(result)
+
+    report = {'commit': commit(),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'cpu_count': os.cpu_count(),
+              'workers': arguments.workers,
+              'fuse': arguments.fuse,
+              'array_graph': arguments.array_graph,
+              'results': results}
+
+    if arguments.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(arguments.output, 'w') as outfile:
+            json.dump(report, outfile, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
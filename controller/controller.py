@@ -1,5 +1,8 @@
-from model.core import Prairie, FunctionThread
-from view.blocks_view import InputBlockView, FunctionBlockView, OutputBlockView, ChartBlockView
+from model.core import Prairie
+from model.plan import CycleError
+from model.engine import Engine
+from model.serializer import describe_block, describe_prairie, create_block_from_dict, read_file
+from view.blocks_view import InputBlockView, FunctionBlockView, OutputBlockView, ChartBlockView, CompositeBlockView
 from view.prairie_view import PrairieView, ConnectionView, BlockView, NodeView
 from model.blocks import *
 from model.core import *
@@ -8,64 +11,6 @@ from pprint import pprint
 import yaml
 
 
-def describe_block(block: Block, mode='debug') -> dict:
-
-    if mode == 'debug':
-
-        block_dict = {'name': block.name,
-                      'type': block.type,
-                      'nodes': {'in': {node.name: node.id for node in list(block.nodes_in().values())},
-                                'out': {node.name: node.id for node in list(block.nodes_out().values())}},
-                      'id': str(block.id)}
-    else:
-
-        block_dict = {'name': block.name,
-                      'type': block.type,
-                      'nodes': {'in': {node.id: node.id for node in list(block.nodes_in().values())},
-                                'out': {node.id: node.id for node in list(block.nodes_out().values())}},
-                      'id': str(block.id)}
-
-    if isinstance(block, InputBlock):
-        block_dict['value'] = block.nodes_in()['x'].value
-    elif isinstance(block, FunctionBlock):
-        block_dict['script_function'] = block.thread.script_function
-        block_dict['script_file'] = block.thread.script_file
-
-    return block_dict
-
-
-def describe_prairie_blocks(prairie: Prairie, mode='debug') -> dict:
-    blocks = prairie.blocks_id()
-    return {block_id: describe_block(blocks[block_id], mode=mode) for block_id in blocks}
-
-
-def describe_prairie_nodes(prairie: Prairie) -> dict:
-    nodes_dict = {}
-    blocks_dict = describe_prairie_blocks(prairie, mode='debug')
-
-    for block_id, block_dict in blocks_dict.items():
-        block_nodes_dict = block_dict['nodes']
-        for node_name, node_id in block_nodes_dict['in'].items():
-            nodes_dict[node_id] = {'block_id': block_id, 'node_name': node_name, 'node_type': 'in'}
-        for node_name, node_id in block_nodes_dict['out'].items():
-            nodes_dict[node_id] = {'block_id': block_id, 'node_name': node_name, 'node_type': 'out'}
-
-    return nodes_dict
-
-
-def describe_prairie(prairie: Prairie) -> dict:
-    connections = prairie.connections_id()
-    nodes = describe_prairie_nodes(prairie)
-
-    blocks_dict = describe_prairie_blocks(prairie, mode='dev')
-
-    connections_dict = {connection.id: [connection.block_in().id, connection.node_in.id,
-                        connection.block_out().id, connection.node_out.id]
-                        for connection in list(connections.values())}
-
-    return {'blocks': blocks_dict, 'connections': connections_dict, 'nodes': nodes}
-
-
 def describe_prairie_view_blocks(prairie_view: PrairieView) -> dict:
     return {block_view_id: [block_view.scenePos().x(), block_view.scenePos().y()]
             for block_view_id, block_view in prairie_view.block_views().items()}
@@ -94,8 +39,16 @@ class Controller:
 
         self.prairie_view.controller = self
 
+        self.engine = Engine(self.prairie)
+        self.engine.connect('started', self.block_started)
+        self.engine.connect('done', self.block_done)
+        self.engine.connect('failed', self.block_failed)
+        self.engine.connect('cancelled', self.block_cancelled)
+
+        self.engine_thread = EngineThread(self.engine)
+        self.block_signals = {}
+
         # self.blocks = []
-        self.threads = ThreadCollector()
         self.blocks = []
         self.connections = []
 
@@ -114,6 +67,10 @@ class Controller:
                                            block_id=block.id,
                                            preview=preview)
 
+        elif block.type == 'composite':
+            block_view = CompositeBlockView(block.name, describe_block(block)['nodes'], block_id=block.id,
+                                            preview=preview)
+
         elif block.type == 'output':
             block_view = OutputBlockView(block.name, describe_block(block)['nodes'], block_id=block.id, preview=preview)
 
@@ -121,12 +78,12 @@ class Controller:
             block_view = ChartBlockView(block.name, describe_block(block)['nodes'], block_id=block.id, preview=preview)
 
         if not preview:
-            thread = Thread(FunctionThread(block))
-            self.threads.add(thread)
-            # print('thread will be added')
-            thread.started.connect(block_view.thread_start)
-            thread.notifyOutput.connect(block_view.thread_done)
-            thread.notifyState.connect(block_view.thread_error)
+            signals = BlockSignals()
+            self.block_signals[block] = signals
+            signals.started.connect(block_view.thread_start)
+            signals.notifyOutput.connect(block_view.thread_done)
+            signals.notifyState.connect(block_view.thread_error)
+            signals.cancelled.connect(block_view.thread_cancelled)
 
         if position is None:
             block_view.setPos(*block_view.position)
@@ -141,26 +98,7 @@ class Controller:
         self.prairie_view.scene.addItem(block_view)
 
     def create_block_from_dict(self, block_dict):
-
-        block_type = block_dict['type']
-
-        if block_type == 'input':
-            block = InputBlock(block_dict['name'], str(block_dict['value']))
-        elif block_type == 'function':
-            block = FunctionBlock(block_dict['script_file'], block_dict['script_function'])
-        elif block_type == 'output':
-            block = OutputBlock(block_dict['name'])
-        elif block_type == 'chart':
-            block = ChartBlock(block_dict['name'])
-        else:
-            block = None
-
-        try:
-            block.id = block_dict['id']
-        except KeyError:
-            pass
-
-        return block
+        return create_block_from_dict(block_dict)
 
     def delete_block(self):
         pass
@@ -211,26 +149,40 @@ class Controller:
 
     def run(self):
         print('try to run')
-        if not self.threads.isRunning():
+        if not self.engine_thread.isRunning():
+            try:
+                self.prairie.plan()
+            except CycleError as exc:
+                print(exc)
+                return
             print('run')
-            print(self.threads.threads_ready())
-            self.threads.start()
+            self.engine_thread.start()
         else:
-            self.threads.quit()
-            self.threads.terminate()
+            # The engine stops at its next dispatch, leaving the GUI thread free
+            self.engine.cancel()
+
+    def block_started(self, block):
+        self.block_signals[block].started.emit()
+
+    def block_done(self, block, output):
+        self.block_signals[block].notifyOutput.emit(output)
+        self.block_signals[block].notifyState.emit(True)
+
+    def block_failed(self, block, exception):
+        print(block.name, 'failed:', exception)
+        self.block_signals[block].notifyState.emit(False)
+
+    def block_cancelled(self, block):
+        self.block_signals[block].cancelled.emit()
 
     def get_block_view_by_id(self):
         pass
 
     def load_file(self, filename):
 
-        import_dict = {}
+        import_dict = read_file(filename)
 
-        with open(filename, 'r') as stream:
-            try:
-                import_dict = yaml.load(stream)
-            except yaml.YAMLError as exc:
-                print(exc)
+        self.prairie.backend = import_dict['prairie'].get('backend', 'thread')
 
         for block_item, block_dict in import_dict['prairie']['blocks'].items():
 
@@ -254,6 +206,9 @@ class Controller:
             else:
                 print('error')
 
+        if self.engine.disk_cache is not None:
+            self.engine.warm_start()
+
     def save_file(self, filename):
         prairie_dict = describe_prairie(self.prairie)
         prairie_view_dict = describe_prairie_view_blocks(self.prairie_view)
@@ -305,7 +260,10 @@ class Controller:
                 block.set_ready()
 
     def update_node_value(self, block_id, node_id, value):
-        self.prairie.blocks_id()[block_id].nodes_id()[node_id].value = value
+        node = self.prairie.blocks_id()[block_id].nodes_id()[node_id]
+        node.set_value(value)
+        # Only the blocks downstream of the edited node run again
+        self.prairie.mark_dirty(node.block)
 
     def get_connected_node_name(self, block_id, node_id):
         node = self.prairie.blocks_id()[block_id].nodes_id()[node_id]
@@ -313,97 +271,23 @@ class Controller:
             return node.connected_nodes()[0].name
 
 
-class Thread(QThread):
+class BlockSignals(QObject):
+    started = pyqtSignal()
     notifyState = pyqtSignal(bool)
     notifyOutput = pyqtSignal(list)
+    cancelled = pyqtSignal()
 
-    def __init__(self, function_thread: FunctionThread, parent=None):
-
-        super(Thread, self).__init__(parent)
-        self.args = []
-        self.kwargs = []
-        self.output = []
-
-        self.block = function_thread.block
-        self.function_attr = -1
-
-        self.exec_import()
-
-    def exec_import(self):
-        # dev : Check if already imported
 
-        script_file = self.block.thread.script_file.strip('.py').replace('/', '.')
+class EngineThread(QThread):
 
-        exec('import ' + script_file)
-        self.function_attr = getattr(eval(script_file), self.block.thread.script_function)
-        a = 0
-
-    def run(self):
-
-        try:
-            #    Function call
-            if len(self.args) == 0 and len(self.kwargs) == 0:
-                self.output = self.function_attr()
-            elif len(self.args) >= 1 and len(self.kwargs) == 0:
-                self.output = self.function_attr(*self.args)
-            elif len(self.args) == 0 and len(self.kwargs) >= 1:
-                self.output = self.function_attr(**self.kwargs)
-            elif len(self.args) > 1 and len(self.kwargs) >= 1:
-                self.output = self.function_attr(*self.args, **self.kwargs)
-            if isinstance(self.output, tuple):
-                self.output = [return_value for return_value in self.output]
-            else:
-                self.output = [self.output]
-            self.set_out_nodes_variables()
-            self.notifyOutput.emit(self.output)
-            self.notifyState.emit(True)
-
-        except:
-            self.block.initialize_in_nodes()
-            self.notifyState.emit(False)
-
-        self.quit()
-
-    def set_arguments(self, args, kwargs=None):
-        self.args = args
-        if kwargs is not None:
-            self.kwargs = kwargs
-        else:
-            self.kwargs = []
-
-    def set_out_nodes_variables(self):
-        # Set the out nodes variables from the thread output
-        for connection in self.block.connections_out():
-            nodes_out = self.block.nodes_out()
-            organized_nodes_out = [nodes_out[output_name] for output_name in self.block.function_signature['returns']]
-            for i, node in enumerate(organized_nodes_out):
-                if self.output is not None:
-                    node.set_value(self.output[i])
-            connection.transfer_value()
-        self.block.initialize_in_nodes()
-
-
-class ThreadCollector(QThread):
+    def __init__(self, engine: Engine, parent=None):
+        """
+        Run the engine out of the GUI thread, the engine events are forwarded to the block views through BlockSignals
 
-    def __init__(self, parent=None):
-        super(ThreadCollector, self).__init__(parent)
-        self.threads = []
+        :param engine: Engine to run
+        """
+        super(EngineThread, self).__init__(parent)
+        self.engine = engine
 
     def run(self):
-        while self.threads_ready():
-            for thread in self.threads:
-                if thread.block.ready and not thread.isRunning():
-                    nodes_in = thread.block.nodes_in()
-                    args = [nodes_in[arg_name].value for arg_name in thread.block.function_signature['args']]
-                    # We only do the args, not kwargs, for now
-                    thread.set_arguments(args)
-                    thread.start()
-
-    def add(self, thread: Thread):
-        self.threads.append(thread)
-
-    def threads_ready(self):
-        return any([thread.block.ready for thread in self.threads])
-
-    def describe_blocks(self):
-        return {thread.block.id: [thread.block.name, thread.block.ready] for thread in self.threads}
+        self.engine.run()
@@ -10,5 +10,11 @@ def output(x):
     return x
 
 
+output.vectorizable = True
+
+
 def chart(x, y):
     return x, y
+
+
+chart.vectorizable = True
@@ -1,3 +1,4 @@
+import asyncio
 import time
 import numpy as np
 import scipy.signal as sp
@@ -7,23 +8,40 @@ def add(x, y):
     return x+y
 
 
+add.vectorizable = True
+
+
 def sub(x, y):
     return x-y
 
 
+sub.vectorizable = True
+
+
 def multiply(x, y):
     return x*y
 
 
+multiply.vectorizable = True
+
+
 def sinus(x):
     return np.sin(x)
 
 
+sinus.vectorizable = True
+
+
 def wait(x):
     time.sleep(x)
     return x
 
 
+async def async_wait(x):
+    await asyncio.sleep(x)
+    return x
+
+
 def double(x, y):
     return x, y*2
 
@@ -40,3 +58,18 @@ def step(sys1):
     t, y = sp.step(sys1)
     return t, y
 
+
+
+def chunks(n):
+    for i in range(int(n)):
+        chunk = np.random.rand(1000)
+        yield chunk
+
+
+def interruptible_wait(x, cancel_token=None):
+    if cancel_token is None:
+        time.sleep(x)
+    else:
+        cancel_token.wait(x)
+        cancel_token.raise_if_cancelled()
+    return x
@@ -4,6 +4,10 @@ from PyQt5.QtWidgets import *
 from controller.controller import Controller
 from view.prairie_view import PrairieView
 from model.core import Prairie
+from model.cache import DiskCache, ResultCache
+from model.schedule import DurationHistory
+from model.remote import RemoteBackend, parse_address
+from model.store import ValueStore
 from view.file_system_tree import Tree
 
 import yaml
@@ -35,10 +39,29 @@ class App(QMainWindow):
 
         self.controller = Controller(self.prairie, self.prairie_view)
 
+        if config_doc.get('result_cache_bytes'):
+            self.controller.engine.cache = ResultCache(config_doc['result_cache_bytes'])
+        if config_doc.get('disk_cache_directory'):
+            self.controller.engine.disk_cache = DiskCache(config_doc['disk_cache_directory'],
+                                                          config_doc.get('disk_cache_bytes', 10 * 1024 ** 3))
+
+        self.controller.engine.free_values = config_doc.get('free_values', False)
+        self.controller.engine.fuse = config_doc.get('fuse_chains', False)
+        self.controller.engine.array_graph = config_doc.get('array_graph', False)
+        self.controller.engine.durations = DurationHistory(config_doc.get('durations_file'))
+        if config_doc.get('remote_workers'):
+            self.controller.engine.backends['remote'] = RemoteBackend([parse_address(address)
+                                                                       for address in config_doc['remote_workers']])
+        if config_doc.get('value_store_bytes'):
+            self.prairie.store = ValueStore(config_doc['value_store_bytes'],
+                                            directory=config_doc.get('value_store_directory'))
+
         self.file_explorer = Tree('files/scripts')
+        # Saved prairies, dropped as composite blocks
+        self.prairie_explorer = Tree('files/prairies')
 
         self.code_tabs.addTab(self.file_explorer, 'Files')
-        self.code_tabs.addTab(QWidget(), 'Blocks')
+        self.code_tabs.addTab(self.prairie_explorer, 'Blocks')
         self.code_tabs.addTab(QWidget(), 'Code')
 
         self.main_layout.addWidget(self.code_tabs)
@@ -0,0 +1,349 @@
+"""
+backends.py gathers the execution backends running the function of a FunctionThread outside of the thread that
+dispatches the blocks. A backend only needs the script file, the function name and the arguments of a block, and
+returns a concurrent.futures.Future of the function output.
+
+The backend of a block is chosen with FunctionThread.backend, or inherited from Prairie.backend:
+- 'thread': the function runs in the thread pool of a ThreadBackend
+- 'process': the function runs in a worker process of a ProcessBackend, out of reach of the GIL of the GUI
+- 'asyncio': the function runs on the event loop of an AsyncioBackend, which is always used for `async def` functions
+- 'remote': the function runs on a worker daemon reached over TCP by the RemoteBackend of remote.py
+
+The futures of the thread, process and remote backends have an `execution` attribute, set before they complete: the
+list [worker, start, end] of the name of the worker that ran the function and of the perf_counter times of the run,
+empty if the function did not run.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import os
+import threading
+import time
+
+import numpy as np
+
+from model.compiler import load_function
+from model.fusion import run_chain
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    # Python < 3.8, large arrays are pickled like any other value
+    shared_memory = None
+
+
+# Arrays smaller than this (in bytes) are cheaper to pickle than to place in shared memory
+SHARED_MEMORY_THRESHOLD = 1 << 20
+
+
+class SharedArray:
+
+    def __init__(self, name: str, shape: tuple, dtype):
+        """
+        A SharedArray describes a numpy array left by a worker process in a shared memory segment. Only this
+        descriptor is pickled back to the parent process.
+
+        :param name: name of the shared memory segment
+        :param shape: shape of the array
+        :param dtype: dtype of the array
+        """
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+    @classmethod
+    def share(cls, array: np.ndarray):
+        segment = shared_memory.SharedMemory(create=True, size=array.nbytes)
+        np.ndarray(array.shape, array.dtype, buffer=segment.buf)[...] = array
+        segment.close()
+
+        return cls(segment.name, array.shape, array.dtype)
+
+    def load(self) -> np.ndarray:
+        """
+        Copy the array out of its shared memory segment and release the segment
+
+        :return: numpy array
+        """
+        segment = shared_memory.SharedMemory(name=self.name)
+        try:
+            array = np.ndarray(self.shape, self.dtype, buffer=segment.buf).copy()
+        finally:
+            segment.close()
+            segment.unlink()
+
+        return array
+
+
+def _share(value):
+    if shared_memory is not None and isinstance(value, np.ndarray) and not value.dtype.hasobject \
+            and value.nbytes >= SHARED_MEMORY_THRESHOLD:
+        return SharedArray.share(value)
+    return value
+
+
+def _unshare(value):
+    if isinstance(value, SharedArray):
+        return value.load()
+    return value
+
+
+def _share_output(output):
+    if isinstance(output, tuple):
+        return tuple(_share(value) for value in output)
+    return _share(output)
+
+
+def _unshare_output(output):
+    if isinstance(output, tuple):
+        return tuple(_unshare(value) for value in output)
+    return _unshare(output)
+
+
+def run_function_in_thread(script_file: str, script_function: str, args: list, kwargs: dict = None):
+    return load_function(script_file, script_function)(*args, **(kwargs or {}))
+
+
+def run_in_thread(execution: list, function, *args):
+    # Filled before the future completes, the future being returned with it
+    start = time.perf_counter()
+    try:
+        return function(*args)
+    finally:
+        execution[:] = [threading.current_thread().name, start, time.perf_counter()]
+
+
+def run_in_process(function, *args) -> tuple:
+    # The clocks of the processes are not compared, only the duration of the run is sent back
+    start = time.perf_counter()
+    result = function(*args)
+    return result, 'process ' + str(os.getpid()), time.perf_counter() - start
+
+
+def run_function(script_file: str, script_function: str, args: list, kwargs: dict = None):
+    """
+    Run a script function in a worker process, large numpy outputs are returned through shared memory
+
+    :param script_file: path of the script file containing the script_function
+    :param script_function: function in script_file to be executed
+    :param args: arguments of the function
+    :param kwargs: keyword arguments of the function
+    :return: output of the function
+    """
+    return _share_output(load_function(script_file, script_function)(*args, **(kwargs or {})))
+
+
+def run_chain_in_process(steps: tuple, args: list) -> tuple:
+    outputs, error, durations = run_chain(steps, args)
+    return [_share_output(output) for output in outputs], error, durations
+
+
+class ThreadBackend:
+
+    def __init__(self, max_workers: int = None):
+        """
+        A ThreadBackend runs script functions in a bounded pool of threads. The pool is started on the first
+        submission and reused by the following runs, so threads are not created once per block execution.
+
+        :param max_workers: number of threads, the number of processors by default
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+
+    @property
+    def executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                                   thread_name_prefix='prairie')
+        return self._executor
+
+    def submit(self, script_file: str, script_function: str, args: list,
+               kwargs: dict = None) -> concurrent.futures.Future:
+        """
+        Run a script function in a thread of the pool
+
+        :param script_file: path of the script file containing the script_function
+        :param script_function: function in script_file to be executed
+        :param args: arguments of the function
+        :param kwargs: keyword arguments of the function
+        :return: future of the function output
+        """
+        return self.timed(run_function_in_thread, script_file, script_function, args, kwargs)
+
+    def submit_chain(self, steps: tuple, args: list) -> concurrent.futures.Future:
+        """
+        Run the functions of a chain of blocks in one thread of the pool
+
+        :param steps: steps of the chain, see fusion.run_chain
+        :param args: arguments of the first function
+        :return: future of the outputs of the functions, of the exception that stopped the chain and of the execution
+        times of the functions
+        """
+        return self.timed(run_chain, steps, args)
+
+    def timed(self, function, *args) -> concurrent.futures.Future:
+        execution = []
+        future = self.executor.submit(run_in_thread, execution, function, *args)
+        future.execution = execution
+        return future
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+class ProcessBackend:
+
+    def __init__(self, max_workers: int = None):
+        """
+        A ProcessBackend runs script functions in a pool of worker processes, so that CPU bound pure Python functions
+        run in parallel. The pool is started on the first submission.
+
+        :param max_workers: number of worker processes, the number of processors by default
+        """
+        self.max_workers = max_workers
+        self._executor = None
+
+    @property
+    def executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._executor is None:
+            if shared_memory is not None:
+                # Workers must share the tracker of the parent, which unlinks the segments they create
+                resource_tracker.ensure_running()
+            self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def submit(self, script_file: str, script_function: str, args: list,
+               kwargs: dict = None) -> concurrent.futures.Future:
+        """
+        Run a script function in a worker process
+
+        :param script_file: path of the script file containing the script_function
+        :param script_function: function in script_file to be executed
+        :param args: arguments of the function
+        :param kwargs: keyword arguments of the function, they have to be picklable
+        :return: future of the function output
+        """
+        return self._unshared(self.executor.submit(run_in_process, run_function, script_file, script_function, args,
+                                                   kwargs),
+                              _unshare_output)
+
+    def submit_chain(self, steps: tuple, args: list) -> concurrent.futures.Future:
+        """
+        Run the functions of a chain of blocks in one worker process
+
+        :param steps: steps of the chain, see fusion.run_chain
+        :param args: arguments of the first function
+        :return: future of the outputs of the functions, of the exception that stopped the chain and of the execution
+        times of the functions
+        """
+        return self._unshared(self.executor.submit(run_in_process, run_chain_in_process, steps, args),
+                              lambda result: ([_unshare_output(output) for output in result[0]],) + result[1:])
+
+    @staticmethod
+    def _unshared(pool_future: concurrent.futures.Future, unshare) -> concurrent.futures.Future:
+        # Future of the result of pool_future, the arrays left in shared memory by the worker being loaded back
+        future = concurrent.futures.Future()
+        future.execution = []
+
+        def done(_):
+            # Loaded even when the future has been cancelled, loading the arrays unlinks their segments
+            try:
+                result, worker, duration = pool_future.result()
+                end = time.perf_counter()
+                future.execution[:] = [worker, end - duration, end]
+                output = unshare(result)
+            except Exception as exc:
+                output, exception = None, exc
+            else:
+                exception = None
+
+            try:
+                if exception is not None:
+                    future.set_exception(exception)
+                else:
+                    future.set_result(output)
+            except concurrent.futures.InvalidStateError:
+                # Cancelled, the output is discarded
+                pass
+
+        pool_future.add_done_callback(done)
+
+        return future
+
+    def kill(self):
+        """
+        Terminate the worker processes, the functions they run fail with BrokenProcessPool. A new pool is started on
+        the next submission.
+        """
+        if self._executor is not None:
+            for process in list(getattr(self._executor, '_processes', {}).values()):
+                process.terminate()
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+class AsyncioBackend:
+
+    def __init__(self, max_workers: int = None):
+        """
+        An AsyncioBackend runs the coroutine functions on a single event loop, so that many I/O bound blocks can wait
+        concurrently without a thread each. Regular functions are bridged to the loop through a thread pool. The loop
+        and its thread are started on the first submission.
+
+        :param max_workers: number of threads of the pool running the regular functions
+        """
+        self.max_workers = max_workers
+        self._loop = None
+        self._thread = None
+        self._executor = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+            self._loop = asyncio.new_event_loop()
+            self._loop.set_default_executor(self._executor)
+            self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+            self._thread.start()
+        return self._loop
+
+    @staticmethod
+    async def run_function(script_file: str, script_function: str, args: list, kwargs: dict = None):
+        function = load_function(script_file, script_function)
+        kwargs = kwargs or {}
+
+        if inspect.iscoroutinefunction(function):
+            return await function(*args, **kwargs)
+        else:
+            return await asyncio.get_event_loop().run_in_executor(None, functools.partial(function, *args, **kwargs))
+
+    def submit(self, script_file: str, script_function: str, args: list,
+               kwargs: dict = None) -> concurrent.futures.Future:
+        """
+        Run a script function on the event loop, cancelling the future cancels the coroutine
+
+        :param script_file: path of the script file containing the script_function
+        :param script_function: function in script_file to be executed
+        :param args: arguments of the function
+        :param kwargs: keyword arguments of the function
+        :return: future of the function output
+        """
+        return asyncio.run_coroutine_threadsafe(self.run_function(script_file, script_function, args, kwargs),
+                                                self.loop)
+
+    def shutdown(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._executor.shutdown()
+            self._loop = None
@@ -1,10 +1,13 @@
 from model.core import Block
 from model.compiler import functions
+import os
 import uuid
 
 
 class FunctionBlock(Block):
-    
+
+    __slots__ = ('function_signature', 'creation_success')
+
     def __init__(self, script_file: str, script_function: str, prairie=None, block_id=None):
         super(FunctionBlock, self).__init__(name=script_function, functional_type='function', prairie=prairie)
 
@@ -33,6 +36,13 @@ class FunctionBlock(Block):
             except KeyError:
                 return False
 
+    # Override
+    def execution_backend(self) -> str:
+        # Coroutine functions can only be awaited on the event loop
+        if self.function_signature.get('coroutine', False):
+            return 'asyncio'
+        return super(FunctionBlock, self).execution_backend()
+
     def create_nodes(self):
 
         for arg in self.function_signature['args']:
@@ -44,6 +54,8 @@ class FunctionBlock(Block):
 
 class InputBlock(FunctionBlock):
 
+    __slots__ = ('sweep',)
+
     def __init__(self, name: str, value, prairie=None):
 
         super(InputBlock, self).__init__('files/scripts/basic_functions.py', 'input', prairie=prairie)
@@ -53,6 +65,9 @@ class InputBlock(FunctionBlock):
         list(self.nodes_in().values())[0].value = value
         list(self.nodes_in().values())[0].ready = True
 
+        # In sweep mode, value evaluates to the list or array of values swept
+        self.sweep = False
+
     def set_ready(self):
         list(self.nodes_in().values())[0].ready = True
         list(self.nodes_out().values())[0].ready = True
@@ -60,6 +75,8 @@ class InputBlock(FunctionBlock):
 
 class OutputBlock(FunctionBlock):
 
+    __slots__ = ()
+
     def __init__(self, name: str, prairie=None):
 
         super(OutputBlock, self).__init__('files/scripts/basic_functions.py', 'output', prairie=prairie)
@@ -76,6 +93,8 @@ class OutputBlock(FunctionBlock):
 
 class ChartBlock(FunctionBlock):
 
+    __slots__ = ()
+
     def __init__(self, name: str, prairie=None):
 
         super(ChartBlock, self).__init__('files/scripts/basic_functions.py', 'chart', prairie=prairie)
@@ -88,4 +107,21 @@ class ChartBlock(FunctionBlock):
     def set_ready(self):
         pass
         # list(self.nodes_in().values())[0].ready = True
-        # list(self.nodes_out().values())[0].ready = True
\ No newline at end of file
+        # list(self.nodes_out().values())[0].ready = True
+
+
+class CompositeBlock(FunctionBlock):
+
+    __slots__ = ()
+
+    def __init__(self, prairie_file: str, prairie=None, block_id=None):
+        """
+        A CompositeBlock runs a saved prairie as a single function, see composite.py. Its input nodes are the input
+        blocks of the sub-prairie and its output nodes the output blocks.
+
+        :param prairie_file: path of the .yml prairie file
+        """
+        super(CompositeBlock, self).__init__(prairie_file, 'composite', prairie=prairie, block_id=block_id)
+
+        self.name = os.path.splitext(os.path.basename(prairie_file))[0]
+        self.type = 'composite'
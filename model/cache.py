@@ -0,0 +1,307 @@
+"""
+cache.py memoizes the results of the blocks. A result is stored under a key made of:
+- the hash of the content of the script file, so that editing a script invalidates its results
+- the name of the function
+- the hash of the values of the arguments, numpy arrays being hashed from their raw buffer
+
+Results are kept in memory by a ResultCache, and across sessions by a DiskCache.
+
+Caching is opt-in: only the functions of pure blocks should be cached, a block drawing random numbers would always
+return the same values.
+"""
+
+from collections import OrderedDict
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+
+import numpy as np
+
+_file_hashes = {}
+
+_MISSING = object()
+
+
+def hash_file(script_file: str) -> str:
+    """
+    Return the hash of the content of a script file, computed again only if the file has been modified
+
+    :param script_file: path of the script file
+    :return: hexadecimal digest
+    """
+    path = os.path.abspath(script_file)
+    stat = os.stat(path)
+
+    cached = _file_hashes.get(path)
+    if cached is None or cached[0] != (stat.st_mtime_ns, stat.st_size):
+        with open(path, 'rb') as file:
+            cached = ((stat.st_mtime_ns, stat.st_size), hashlib.blake2b(file.read(), digest_size=16).hexdigest())
+        _file_hashes[path] = cached
+
+    return cached[1]
+
+
+def hash_value(value, digest):
+    """
+    Feed a value to a hashlib digest
+
+    :param value: value to hash
+    :param digest: hashlib object updated in place
+    """
+    if isinstance(value, np.ndarray) and not value.dtype.hasobject:
+        digest.update(b'ndarray' + value.dtype.str.encode() + str(value.shape).encode())
+        digest.update(memoryview(np.ascontiguousarray(value)).cast('B'))
+    elif isinstance(value, (list, tuple)):
+        digest.update(type(value).__name__.encode() + str(len(value)).encode())
+        for item in value:
+            hash_value(item, digest)
+    else:
+        digest.update(pickle.dumps(value, protocol=4))
+
+
+def result_key(script_file: str, script_function: str, args: list) -> str:
+    """
+    Return the key under which the result of a function call is cached
+
+    :param script_file: path of the script file containing the script_function, or of the .yml prairie file of a
+    composite block
+    :param script_function: function in script_file
+    :param args: arguments of the function
+    :return: hexadecimal digest
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    if script_file.endswith('.yml'):
+        # A composite function changes with any of the scripts of its sub-prairie
+        from model.composite import source_files
+        for source_file in source_files(script_file):
+            digest.update(hash_file(source_file).encode() + b':')
+    else:
+        digest.update(hash_file(script_file).encode() + b':')
+    digest.update(script_function.encode())
+    hash_value(list(args), digest)
+
+    return digest.hexdigest()
+
+
+def size_of(value) -> int:
+    """
+    Return an estimation of the memory used by a value, in bytes
+
+    :param value: value
+    :return: number of bytes
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    elif isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(size_of(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+
+    def __init__(self, max_bytes: int = 256 * 1024 ** 2):
+        """
+        A ResultCache keeps the outputs of the functions in memory, the least recently used outputs being evicted
+        when the memory budget is exceeded
+
+        :param max_bytes: memory budget of the cache, in bytes
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+
+        # Outputs found in memory, found in the fallback cache, and found in neither
+        self.hits = 0
+        self.fallback_hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: str):
+        return key in self._entries
+
+    def get(self, key: str, default=None, fallback=None):
+        """
+        Return the output cached under key and mark it as recently used
+
+        :param key: key returned by result_key
+        :param default: value returned if the key is not cached
+        :param fallback: cache looked up when the key is not in memory, such as a DiskCache, the output found being
+        kept in memory. A miss is only counted when neither has the key.
+        :return: output
+        """
+        try:
+            output, size = self._entries[key]
+        except KeyError:
+            output = default if fallback is None else fallback.get(key, _MISSING)
+            if output is _MISSING or fallback is None:
+                self.misses += 1
+                return default
+            self.fallback_hits += 1
+            self.put(key, output)
+            return output
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return output
+
+    def put(self, key: str, output):
+        """
+        Cache an output, evicting the least recently used outputs to stay within the memory budget
+
+        :param key: key returned by result_key
+        :param output: output of the function
+        """
+        size = size_of(output)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self.bytes -= self._entries.pop(key)[1]
+
+        while self._entries and self.bytes + size > self.max_bytes:
+            self.bytes -= self._entries.popitem(last=False)[1][1]
+
+        self._entries[key] = (output, size)
+        self.bytes += size
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+
+class DiskCache:
+
+    def __init__(self, directory: str, max_bytes: int = 10 * 1024 ** 3):
+        """
+        A DiskCache keeps the outputs of the functions in a directory shared by all the sessions. Each output is stored
+        in a sub-directory named after its key: numpy arrays as .npy files, memory-mapped when loaded, other values
+        pickled. The least recently used outputs are removed when the size of the directory exceeds max_bytes.
+
+        :param directory: path of the cache directory, created if needed
+        :param max_bytes: size limit of the cache directory, in bytes
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._sizes = {}
+        for key in os.listdir(directory):
+            try:
+                with open(os.path.join(directory, key, 'meta.pkl'), 'rb') as file:
+                    self._sizes[key] = pickle.load(file)['size']
+            except (OSError, pickle.UnpicklingError, EOFError, KeyError):
+                continue
+        self.bytes = sum(self._sizes.values())
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def __contains__(self, key: str):
+        return key in self._sizes
+
+    def get(self, key: str, default=None):
+        """
+        Return the output stored under key and mark it as recently used
+
+        :param key: key returned by result_key
+        :param default: value returned if the key is not stored
+        :return: output, numpy arrays being copy-on-write memory maps of their .npy file
+        """
+        entry = os.path.join(self.directory, key)
+
+        try:
+            with open(os.path.join(entry, 'meta.pkl'), 'rb') as file:
+                meta = pickle.load(file)
+
+            values = []
+            for filename in meta['files']:
+                path = os.path.join(entry, filename)
+                if filename.endswith('.npy'):
+                    values.append(np.load(path, mmap_mode='c'))
+                else:
+                    with open(path, 'rb') as file:
+                        values.append(pickle.load(file))
+
+            os.utime(entry)
+
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError, ValueError):
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return tuple(values) if meta['tuple'] else values[0]
+
+    def put(self, key: str, output):
+        """
+        Store an output, then remove the least recently used outputs if the cache directory is too large
+
+        :param key: key returned by result_key
+        :param output: output of the function
+        """
+        if key in self._sizes:
+            return
+
+        values = output if isinstance(output, tuple) else (output,)
+
+        # Written aside then renamed, so that a concurrent session never reads a partial entry
+        temporary = os.path.join(self.directory, '.' + key + '-' + str(os.getpid()))
+        os.makedirs(temporary, exist_ok=True)
+
+        try:
+            files = []
+            for i, value in enumerate(values):
+                if isinstance(value, np.ndarray) and not value.dtype.hasobject:
+                    filename = str(i) + '.npy'
+                    np.save(os.path.join(temporary, filename), value)
+                else:
+                    filename = str(i) + '.pkl'
+                    with open(os.path.join(temporary, filename), 'wb') as file:
+                        pickle.dump(value, file, protocol=4)
+                files.append(filename)
+
+            size = sum(os.path.getsize(os.path.join(temporary, filename)) for filename in files)
+            with open(os.path.join(temporary, 'meta.pkl'), 'wb') as file:
+                pickle.dump({'tuple': isinstance(output, tuple), 'files': files, 'size': size}, file)
+
+            os.rename(temporary, os.path.join(self.directory, key))
+
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            shutil.rmtree(temporary, ignore_errors=True)
+            return
+
+        self._sizes[key] = size
+        self.bytes += size
+
+        if self.bytes > self.max_bytes:
+            self.cleanup()
+
+    def cleanup(self):
+        """
+        Remove the least recently used outputs until the cache directory fits in max_bytes
+        """
+        def last_use(key):
+            try:
+                return os.path.getmtime(os.path.join(self.directory, key))
+            except OSError:
+                return 0
+
+        for key in sorted(self._sizes, key=last_use):
+            if self.bytes <= self.max_bytes:
+                break
+            shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+            self.bytes -= self._sizes.pop(key)
+
+    def clear(self):
+        for key in list(self._sizes):
+            shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+        self._sizes.clear()
+        self.bytes = 0
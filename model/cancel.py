@@ -0,0 +1,68 @@
+"""
+cancel.py lets a run be stopped without killing the thread running it. The Engine checks its CancellationToken
+between two dispatches, and gives a token to the script functions having a `cancel_token` keyword argument, so that
+long functions can stop by themselves:
+
+    def interruptible_wait(x, cancel_token=None):
+        cancel_token.wait(x)
+        cancel_token.raise_if_cancelled()
+        return x
+
+The token of a block is cancelled with the token of its run, or alone when the block exceeds its timeout.
+"""
+
+import threading
+
+
+class Cancelled(Exception):
+    pass
+
+
+class CancellationToken:
+
+    def __init__(self, parent=None):
+        """
+        A CancellationToken is a flag set once, from any thread, to ask a run or a function to stop
+
+        :param parent: CancellationToken whose cancellation cancels this token too
+        """
+        self._event = threading.Event()
+        self._children = []
+        self._lock = threading.Lock()
+
+        if parent is not None:
+            parent.add_child(self)
+
+    def add_child(self, token):
+        with self._lock:
+            self._children.append(token)
+            cancelled = self.cancelled
+        if cancelled:
+            token.cancel()
+
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            children = list(self._children)
+        for token in children:
+            token.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Wait until the token is cancelled or the timeout expires
+
+        :param timeout: duration in seconds, None to wait for the cancellation
+        :return: weather the token has been cancelled
+        """
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        """
+        :raise Cancelled: if the token has been cancelled
+        """
+        if self.cancelled:
+            raise Cancelled('run cancelled')
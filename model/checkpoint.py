@@ -0,0 +1,121 @@
+"""
+checkpoint.py keeps the outputs of the blocks of a run in a run directory as soon as they complete, so that a run
+stopped by a failure, a cancellation or a crash resumes from where it stopped instead of computing everything again:
+
+    python -m prairie run files/prairies/the_long_example.yml --checkpoint runs/example
+    python -m prairie resume runs/example
+
+A run directory contains:
+- prairie.yml: the prairie run, with the values of its input blocks, resumed from this file
+- outputs: the outputs of the blocks that completed, in the format of a DiskCache keyed by result_key, so that a block
+  is only restored if its script and its arguments are unchanged
+- failed.json: the blocks that failed and their exception, the frontier from which the run resumes
+
+At resume, the outputs are restored following the plan from the input blocks, as by Engine.warm_start: the blocks
+whose producers have all been restored and whose output is found are clean, the next incremental run executes the
+others.
+"""
+
+import json
+import os
+import pickle
+
+from model.cache import DiskCache
+from model.serializer import load_prairie, save_prairie
+from model.stream import Stream
+
+
+class Checkpoint:
+
+    def __init__(self, directory: str):
+        """
+        A Checkpoint records the outputs of the blocks run by an Engine in a run directory
+
+        :param directory: path of the run directory, created if needed
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        # Never evicted, a missing output would be computed again at resume
+        self.outputs = DiskCache(os.path.join(directory, 'outputs'), max_bytes=float('inf'))
+        self.failed = {}
+
+        self._engine = None
+
+        try:
+            with open(self.failed_file, 'r') as file:
+                self.failed = json.load(file)
+        except (OSError, ValueError):
+            self.failed = {}
+
+    @property
+    def prairie_file(self) -> str:
+        return os.path.join(self.directory, 'prairie.yml')
+
+    @property
+    def failed_file(self) -> str:
+        return os.path.join(self.directory, 'failed.json')
+
+    def save_prairie(self, prairie):
+        save_prairie(prairie, self.prairie_file)
+
+    def load_prairie(self):
+        """
+        Load the prairie of the run directory
+
+        :return: Prairie
+        :raise FileNotFoundError: if the directory does not contain a checkpointed run
+        """
+        if not os.path.isfile(self.prairie_file):
+            raise FileNotFoundError('no checkpointed run in ' + self.directory)
+        return load_prairie(self.prairie_file)
+
+    def attach(self, engine):
+        """
+        Record the outputs of the blocks run by an engine, and the blocks that failed
+
+        :param engine: Engine
+        """
+        self._engine = engine
+        engine.connect('done', self.done)
+        engine.connect('failed', self.block_failed)
+
+    def restore(self, engine) -> int:
+        """
+        Set the outputs of the blocks recorded, so that the next incremental run of the engine starts from the failed
+        frontier
+
+        :param engine: Engine of the prairie loaded by load_prairie
+        :return: number of blocks restored
+        """
+        return engine.warm_start(self.outputs)
+
+    def done(self, block, output: list):
+        # Streams are read once and cannot be stored
+        if any(isinstance(value, Stream) for value in output):
+            return
+
+        plan = self._engine.prairie.plan()
+        position = plan.index[block]
+        args = plan.arguments(position)
+        if self._engine.streaming(block, args):
+            return
+
+        batched = self._engine.batched_arguments(plan, position)
+        try:
+            key = self._engine.result_key(block, args, batched)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+
+        self.outputs.put(key, tuple(output) if len(output) > 1 else output[0])
+
+        if self.failed.pop(str(block.id), None) is not None:
+            self.save_failed()
+
+    def block_failed(self, block, exception: Exception):
+        self.failed[str(block.id)] = {'name': block.name, 'exception': repr(exception)}
+        self.save_failed()
+
+    def save_failed(self):
+        with open(self.failed_file, 'w') as file:
+            json.dump(self.failed, file, indent=2)
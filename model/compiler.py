@@ -5,11 +5,14 @@ import string
 import importlib.util
 import os
 
+_modules = {}
+_functions = {}
+
 
 def function_returns(program_string):
     result = {}
     func_name = None
-    for line in re.findall('def .+\w|(?<=return ).+', program_string):
+    for line in re.findall('def .+\w|(?<=return ).+|(?<=yield ).+', program_string):
         if line.startswith('def '):
             func_name = line[4:]
         result[func_name] = line
@@ -27,6 +30,37 @@ def exec_import(script_file, script_function):
     return function_attr
 
 
+def load_module(script_file):
+    """
+    Import a script file once per process and per modification, without requiring it to be importable as a package.
+    A script edited since it was imported is imported again, so that its functions match the hash of the file keying
+    their cached results.
+
+    :param script_file: path of the script file
+    :return: module
+    """
+    path = os.path.abspath(script_file)
+    stat = os.stat(path)
+
+    cached = _modules.get(path)
+    if cached is None or cached[0] != (stat.st_mtime_ns, stat.st_size):
+        spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        cached = ((stat.st_mtime_ns, stat.st_size), module)
+        _modules[path] = cached
+
+    return cached[1]
+
+
+def load_function(script_file, script_function):
+    if script_file.endswith('.yml'):
+        # A prairie file, run as a whole by a composite block
+        from model.composite import load_composite
+        return load_composite(script_file)
+    return getattr(load_module(script_file), script_function)
+
+
 def format_filename(s):
     """Take a string and return a valid filename constructed from the string.
 Uses a whitelist approach: any characters not present in valid_chars are
@@ -46,6 +80,29 @@ an invalid filename.
 
 
 def functions(file_path: str) -> dict:
+    """
+    Return the signature of the functions of a script file, parsed again only if the file has been modified. The
+    signature of a .yml prairie file is the one of its 'composite' function, see composite.py.
+
+    :param file_path: path of the script file
+    :return: dictionary from function name to signature
+    """
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+
+    cached = _functions.get(path)
+    if cached is None or cached[0] != (stat.st_mtime_ns, stat.st_size):
+        if file_path.endswith('.yml'):
+            from model.composite import parse_composite
+            cached = ((stat.st_mtime_ns, stat.st_size), parse_composite(file_path))
+        else:
+            cached = ((stat.st_mtime_ns, stat.st_size), parse_functions(file_path))
+        _functions[path] = cached
+
+    return cached[1]
+
+
+def parse_functions(file_path: str) -> dict:
     with open(file_path, 'r') as file:
         f = file.read()
         ast_parsed_object = ast.parse(f)
@@ -60,7 +117,7 @@ def functions(file_path: str) -> dict:
 
         for x in ast_parsed_object.body:
             function_dict = {}
-            if isinstance(x, ast.FunctionDef):
+            if isinstance(x, (ast.FunctionDef, ast.AsyncFunctionDef)):
                 function_name = x.name
 
                 function_attr = exec_import(file_path, function_name)
@@ -74,6 +131,9 @@ def functions(file_path: str) -> dict:
                 # function_dict['returns'] = ['return_' + str(i) for i, ret in enumerate(x.body)
                 #                             if isinstance(ret, ast.Return)]
                 function_dict['returns'] = function_returns(inspect.getsource(function_attr))
+                function_dict['coroutine'] = inspect.iscoroutinefunction(function_attr)
+                function_dict['generator'] = inspect.isgeneratorfunction(function_attr)
+                function_dict['vectorizable'] = getattr(function_attr, 'vectorizable', False)
 
                 functions_dict[x.name] = function_dict
 
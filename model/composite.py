@@ -0,0 +1,191 @@
+"""
+composite.py turns a saved prairie into a single function, so that a whole .yml prairie can be used as one block of
+another prairie. The input blocks of the sub-prairie are the arguments of the function, named after the blocks, and
+its output blocks are the returned values. Chart blocks, and the blocks no output block depends on, are left out.
+
+The sub-prairie is compiled once per file modification into a list of steps, the calls of its blocks in topological
+order, each argument being read from:
+- ('argument', i): the i-th argument of the composite function
+- ('step', i, k): the k-th return value of the i-th step
+- ('value', value): the value of an input node connected to nothing
+
+The compiler gives the signature of a .yml file as the one of its 'composite' function, and load_function returns the
+CompositeFunction, so that a CompositeBlock runs on every backend like any script function, the workers loading and
+compiling the sub-prairie themselves.
+
+Examples :
+
+    a ---- add ---- sinus ---- output        composite(a, b) returns output
+          /
+    b ----
+"""
+
+import asyncio
+import inspect
+import os
+import threading
+
+from model.blocks import InputBlock
+from model.compiler import load_function
+from model.serializer import load_prairie
+
+_composites = {}
+_loading = set()
+_lock = threading.RLock()
+
+
+def unique_names(names: list) -> list:
+    """
+    Suffix the names appearing several times with their rank, node names having to be unique within a block
+
+    :param names: list of names
+    :return: list of unique names
+    """
+    unique = []
+    for i, name in enumerate(names):
+        unique.append(name + '_' + str(names[:i].count(name) + 1) if names.count(name) > 1 else name)
+    return unique
+
+
+class CompositeFunction:
+
+    def __init__(self, steps: tuple, outputs: tuple, signature: dict):
+        """
+        A CompositeFunction runs the steps of a compiled sub-prairie one after the other
+
+        :param steps: tuple of (script_file, script_function, sources), sources giving where each argument is read
+        :param outputs: source of each returned value
+        :param signature: signature of the function, in the format of compiler.functions
+        """
+        self.steps = steps
+        self.outputs = outputs
+        self.signature = signature
+
+    def __call__(self, *args):
+        values = []
+
+        def read(source):
+            if source[0] == 'argument':
+                return args[source[1]]
+            elif source[0] == 'step':
+                return values[source[1]][source[2]]
+            return source[1]
+
+        for script_file, script_function, sources in self.steps:
+            function = load_function(script_file, script_function)
+            output = function(*[read(source) for source in sources])
+            if inspect.iscoroutine(output):
+                output = asyncio.run(output)
+            values.append(output if isinstance(output, tuple) else (output,))
+
+        outputs = tuple(read(source) for source in self.outputs)
+        if len(outputs) == 1:
+            return outputs[0]
+        return outputs if outputs else None
+
+
+def compile_composite(prairie) -> CompositeFunction:
+    """
+    Compile a prairie into a CompositeFunction
+
+    :param prairie: Prairie to compile
+    :return: CompositeFunction
+    :raise CycleError: if the prairie contains a cycle
+    """
+    plan = prairie.plan()
+
+    # Arguments and returned values in the order of the prairie file
+    blocks = list(prairie.iter_blocks())
+    inputs = [plan.index[block] for block in blocks if isinstance(block, InputBlock)]
+    outputs = [plan.index[block] for block in blocks if block.type == 'output']
+    argument = {position: i for i, position in enumerate(inputs)}
+    step = {}
+
+    def source(node):
+        if not node.connections:
+            return 'value', node.value
+        producer_node = node.connections[-1].node_in
+        producer = plan.index[producer_node.block]
+        if producer in argument:
+            return 'argument', argument[producer]
+        return 'step', step[producer], plan.outputs[producer].index(plan.slot[producer_node])
+
+    steps = []
+    for position in sorted(plan.upstream(outputs)):
+        block = plan.blocks[position]
+        if position in argument or block.type == 'output':
+            continue
+        step[position] = len(steps)
+        steps.append((block.thread.script_file, block.thread.script_function,
+                      tuple(source(plan.nodes[slot]) for slot in plan.inputs[position])))
+
+    signature = {'args': unique_names([plan.blocks[position].name for position in inputs]),
+                 'kwargs': {},
+                 'returns': unique_names([plan.blocks[position].name for position in outputs]),
+                 'coroutine': False,
+                 'generator': False,
+                 'vectorizable': False}
+
+    return CompositeFunction(tuple(steps),
+                             tuple(source(plan.nodes[plan.inputs[position][0]]) for position in outputs),
+                             signature)
+
+
+def load_composite(prairie_file: str) -> CompositeFunction:
+    """
+    Return the CompositeFunction of a prairie file, compiled again only if the file has been modified
+
+    :param prairie_file: path of the .yml prairie file
+    :return: CompositeFunction
+    :raise RecursionError: if the prairie contains a composite block of itself
+    """
+    path = os.path.abspath(prairie_file)
+    stat = os.stat(path)
+
+    with _lock:
+        cached = _composites.get(path)
+        if cached is None or cached[0] != (stat.st_mtime_ns, stat.st_size):
+            if path in _loading:
+                raise RecursionError(prairie_file + ' contains a composite block of itself')
+            _loading.add(path)
+            try:
+                cached = ((stat.st_mtime_ns, stat.st_size), compile_composite(load_prairie(prairie_file)))
+            finally:
+                _loading.discard(path)
+            _composites[path] = cached
+
+    return cached[1]
+
+
+def source_files(prairie_file: str) -> list:
+    """
+    Return the files a composite function depends on: the prairie file and the scripts of its steps, recursing into
+    the nested composite blocks
+
+    :param prairie_file: path of the .yml prairie file
+    :return: sorted list of absolute paths
+    """
+    files = set()
+    pending = [os.path.abspath(prairie_file)]
+    while pending:
+        path = pending.pop()
+        if path in files:
+            continue
+        files.add(path)
+        for script_file, _, _ in load_composite(path).steps:
+            script_file = os.path.abspath(script_file)
+            if script_file.endswith('.yml'):
+                pending.append(script_file)
+            else:
+                files.add(script_file)
+    return sorted(files)
+
+
+def parse_composite(prairie_file: str) -> dict:
+    """
+    Return the signature of a prairie file, in the format of compiler.functions
+
+    :param prairie_file: path of the .yml prairie file
+    :return: dictionary from 'composite' to its signature
+    """
+    return {'composite': load_composite(prairie_file).signature}
@@ -20,14 +20,29 @@ Examples :
 
 """
 
+from types import MappingProxyType
 from typing import List
 
+from model.plan import ExecutionPlan, compile_plan
+from model.store import StoredArray
+
+import queue
+import sys
 import uuid
 import os
 
+# Connections of the nodes connected to nothing, shared by all of them until their first connection
+_NO_CONNECTIONS = ()
+
+
+def generate_id() -> str:
+    return str(uuid.uuid4())
+
 
 class Node:
 
+    __slots__ = ('name', 'connections', 'type', '_id', '_value', '_ready', 'pinned', 'block')
+
     def __init__(self, name: str, functional_type: str, block):
         """
         A Node is an object containing a value and connected to other nodes through connections. A node can transfer
@@ -39,14 +54,18 @@ class Node:
         """
 
         self.name = name
-        self.connections = []
+        self.connections = _NO_CONNECTIONS
 
         self.type = functional_type
 
-        self._id = uuid.uuid4()
-        self.value = -1
+        # Generated on first use, the engine refers to the nodes by their slot in the plan
+        self._id = None
+        self._value = -1
         self._ready = False
 
+        # A pinned output node keeps its value when the engine frees the values no block needs anymore
+        self.pinned = False
+
         self.block = block
 
     def __bool__(self):
@@ -54,11 +73,47 @@ class Node:
 
     @property
     def id(self):
-        return str(self._id)
+        if self._id is None:
+            self._id = generate_id()
+        return self._id
 
     @id.setter
     def id(self, new_id: str):
-        self._id = uuid.UUID(new_id)
+        old_id = self._id
+        self._id = str(uuid.UUID(str(new_id)))
+        if self.block is not None and old_id is not None:
+            self.block.reindex_node(self, old_id)
+
+    @property
+    def value(self):
+        value = self._value
+        if type(value) is StoredArray:
+            return value.array
+        return value
+
+    @value.setter
+    def value(self, value):
+        store = self.store()
+        if store is not None and store.accepts(value):
+            value = store.put(value)
+        self._value = value
+
+    def store(self):
+        """
+        Return the ValueStore of the prairie containing the node
+
+        :return: ValueStore, None if the values are held by the nodes
+        """
+        prairie = self.block.prairie if self.block is not None else None
+        return prairie.store if prairie is not None else None
+
+    def share_value(self, node):
+        """
+        Give the node the value of another node, a stored array being shared rather than stored again
+
+        :param node: node holding the value
+        """
+        self._value = node._value
 
     @property
     def ready(self) -> bool:
@@ -73,6 +128,17 @@ class Node:
     def ready(self, ready):
         self._ready = ready
 
+    def add_connection(self, connection):
+        if self.connections is _NO_CONNECTIONS:
+            self.connections = [connection]
+        else:
+            self.connections.append(connection)
+
+    def remove_connection(self, connection):
+        self.connections.remove(connection)
+        if not self.connections:
+            self.connections = _NO_CONNECTIONS
+
     # Public
     def is_connected(self):
         """
@@ -104,6 +170,9 @@ class Node:
 
 class Block:
 
+    __slots__ = ('_nodes', '_nodes_by_name', '_nodes_by_id', '_nodes_in', '_nodes_out', 'prairie', '_id', 'thread',
+                 '_ready', '_name', 'type', 'dirty', 'batched')
+
     def __init__(self, name: str, functional_type: str=None, prairie=None):
         """
         A Block contains input Nodes, output Nodes and a BlockThread. The goal of a block is to pass the values of the
@@ -115,14 +184,28 @@ class Block:
         """
 
         self._nodes = []
+        # Indexes of the nodes, kept up to date by add_node and by the id setter of the nodes. The index by id is built
+        # on the first lookup by id, most blocks are never looked up by node id.
+        self._nodes_by_name = {}
+        self._nodes_by_id = None
+        self._nodes_in = {}
+        self._nodes_out = {}
+
+        self.prairie = None
 
-        self._id = uuid.uuid4()
+        # Generated on first use, like the ids of the nodes and of the connections
+        self._id = None
         self.thread = FunctionThread(self)
         self._ready = False
 
         self.name = name
         self.type = functional_type
 
+        # A dirty block has to be executed again, its output nodes do not hold up to date values
+        self.dirty = True
+        # A batched block holds in its output nodes the values computed for each element of a sweep
+        self.batched = False
+
         if isinstance(prairie, Prairie):
             prairie.add_block(self)
 
@@ -135,33 +218,90 @@ class Block:
         """
         return all(node.ready for node in list(self.nodes_in().values()))
 
-    def update_ready(self):
+    def update_ready(self) -> bool:
         """
         Update the Ready attribute of the block if all the input nodes of the block are ready
 
-        :return: boolean
+        :return: weather the block just became ready
         """
+        was_ready = self._ready
         self._ready = self.ready
+        return self._ready and not was_ready
+
+    def notify_ready(self):
+        """
+        Push the block onto the ready queue of its prairie, if the block just became ready
+        """
+        if self.update_ready() and self.prairie is not None:
+            self.prairie.ready_queue.put(self)
 
     @property
     def id(self):
-        return str(self._id)
+        if self._id is None:
+            self._id = generate_id()
+        return self._id
 
     @id.setter
     def id(self, new_id: str):
-        self._id = uuid.UUID(new_id)
+        old_id = self._id
+        self._id = str(uuid.UUID(str(new_id)))
+        if self.prairie is not None and old_id is not None:
+            self.prairie.reindex_block(self, old_id=old_id)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @name.setter
+    def name(self, name: str):
+        old_name = getattr(self, '_name', None)
+        self._name = name
+        if self.prairie is not None:
+            self.prairie.reindex_block(self, old_name=old_name)
 
     @property
     def nodes(self):
-        return {node.name: node for node in self._nodes}
+        """
+        Return the nodes of the block by name, as a read-only view kept up to date
+
+        :return: mapping from node name to node
+        """
+        return MappingProxyType(self._nodes_by_name)
 
     @nodes.setter
     def nodes(self, new_nodes: List[Node]):
-        self._nodes = new_nodes
+        self._nodes = list(new_nodes)
+        self._nodes_by_id = None
+        for index in (self._nodes_by_name, self._nodes_in, self._nodes_out):
+            index.clear()
+        for node in self._nodes:
+            self.index_node(node)
         self.update_ready()
 
     def nodes_id(self):
-        return {node.id: node for node in self._nodes}
+        if self._nodes_by_id is None:
+            self._nodes_by_id = {node.id: node for node in self._nodes}
+        return MappingProxyType(self._nodes_by_id)
+
+    def index_node(self, node: Node):
+        self._nodes_by_name[node.name] = node
+        if self._nodes_by_id is not None:
+            self._nodes_by_id[node.id] = node
+        if node.type == 'in':
+            self._nodes_in[node.name] = node
+        elif node.type == 'out':
+            self._nodes_out[node.name] = node
+
+    def reindex_node(self, node: Node, old_id: str):
+        """
+        Update the index of the nodes by id once the id of a node changed
+
+        :param node: node of the block
+        :param old_id: id the node had
+        """
+        if self._nodes_by_id is not None and self._nodes_by_id.get(old_id) is node:
+            del self._nodes_by_id[old_id]
+            self._nodes_by_id[node.id] = node
 
     def connections(self):
         """
@@ -169,7 +309,7 @@ class Block:
         :return:
         """
         connections = []
-        for node in self.nodes:
+        for node in self._nodes:
             connections += node.connections
         return connections
 
@@ -198,10 +338,24 @@ class Block:
         else:
             return False
 
+    def execution_backend(self) -> str:
+        """
+        Return the backend running the block thread: the one of the thread if set, else the one of the prairie
+
+        :return: 'thread', 'process' or 'asyncio'
+        """
+        if self.thread.backend is not None:
+            return self.thread.backend
+        elif self.prairie is not None:
+            return self.prairie.backend
+        else:
+            return 'thread'
+
     def add_node(self, name: str, functional_type: str) -> Node:
 
         node = Node(name, functional_type, self)
         self._nodes.append(node)
+        self.index_node(node)
         return node
 
     def nodes_values(self):
@@ -209,10 +363,10 @@ class Block:
         return {node.name: node.value for node in self._nodes}
 
     def nodes_in(self):
-        return {node.name: node for node in self._nodes if node.type == 'in'}
+        return MappingProxyType(self._nodes_in)
 
     def nodes_out(self):
-        return {node.name: node for node in self._nodes if node.type == 'out'}
+        return MappingProxyType(self._nodes_out)
 
     def node(self, node_name: str):
         try:
@@ -233,10 +387,13 @@ class Block:
     def initialize_in_nodes(self):
         for node in list(self.nodes_in().values()):
             node.ready = False
+        self.update_ready()
 
 
 class Connection:
 
+    __slots__ = ('node_in', 'node_out', '_ready', '_connection_success', '_id')
+
     def __init__(self, node_in: Node, node_out: Node):
         """
         A Connection connects two Nodes together and transfer the value of an output node to the input nodes.
@@ -252,13 +409,13 @@ class Connection:
 
         self._connection_success = False
 
-        self._id = uuid.uuid4()
+        self._id = None
 
         if isinstance(node_in, Node) and isinstance(node_out, Node):
             if node_in.type == 'out' and node_out.type == 'in' and node_in.block != node_out.block:
                 # and not node_out.is_connected():
-                self.node_in.connections.append(self)
-                self.node_out.connections.append(self)
+                self.node_in.add_connection(self)
+                self.node_out.add_connection(self)
                 self._connection_success = True
 
     def __bool__(self):
@@ -266,11 +423,17 @@ class Connection:
 
     @property
     def id(self):
-        return str(self._id)
+        if self._id is None:
+            self._id = generate_id()
+        return self._id
 
     @id.setter
     def id(self, new_id: str):
-        self._id = uuid.UUID(new_id)
+        old_id = self._id
+        self._id = str(uuid.UUID(str(new_id)))
+        prairie = self.node_in.block.prairie if isinstance(self.node_in, Node) and self.node_in.block else None
+        if prairie is not None and old_id is not None:
+            prairie.reindex_connection(self, old_id)
 
     def block_in(self) -> Block:
         """
@@ -301,21 +464,24 @@ class Connection:
         Disconnect two nodes by removing the connection to their connections list
         :return: Weather the disconnection is successful
         """
-        if self in [self.node_in.connections, self.node_out.connections]:
-            self.node_in.connections.remove(self)
-            self.node_out.connections.remove(self)
+        if self in self.node_in.connections and self in self.node_out.connections:
+            self.node_in.remove_connection(self)
+            self.node_out.remove_connection(self)
             return True
         else:
             return False
 
     def transfer_value(self):
-        self.node_out.value = self.node_in.value
+        self.node_out.share_value(self.node_in)
         self.node_out.ready = True
-        self.block_out().update_ready()
+        self.block_out().notify_ready()
 
 
 class FunctionThread:
 
+    __slots__ = ('block', '_script_file', '_script_function', '_ready', 'running', 'backend', 'timeout', 'cache_hits',
+                 'cache_misses', 'valid_script_file')
+
     def __init__(self, block: Block):
         """
         A BlockThread is a thread where a specific function is executed
@@ -329,9 +495,15 @@ class FunctionThread:
         self._ready = False
         self.running = False
 
+        # None to use the backend of the prairie
+        self.backend = None
+        # Wall-clock time after which the engine fails the block, in seconds, None for no limit
+        self.timeout = None
+
+        self.cache_hits = 0
+        self.cache_misses = 0
+
         self.valid_script_file = False
-        self.inputs = {}
-        self.outputs = {}
 
     @property
     def ready(self):
@@ -349,7 +521,8 @@ class FunctionThread:
     @script_file.setter
     def script_file(self, script_file):
         if os.path.exists(script_file):
-            self._script_file = script_file
+            # Shared by all the blocks of the same script
+            self._script_file = sys.intern(script_file)
             self.valid_script_file = True
 
     @property
@@ -358,7 +531,7 @@ class FunctionThread:
 
     @script_function.setter
     def script_function(self, script_function):
-        self._script_function = script_function
+        self._script_function = sys.intern(script_function)
 
 
 class Prairie:
@@ -368,8 +541,30 @@ class Prairie:
         A Prairie is an environment where Blocks operate through their connections
         """
 
-        self._blocks = []
-        self._connections = []
+        # Insertion ordered sets: the blocks with the rank at which they were added, the connections with None
+        self._blocks = {}
+        self._connections = {}
+        self._rank = 0
+
+        # Indexes, kept up to date as blocks and connections are added, removed or given a new id or name. A name
+        # given to several blocks refers to the last one added. The indexes by id are only built when first asked for,
+        # which generates the ids.
+        self._blocks_by_id = None
+        self._blocks_by_name = {}
+        self._connections_by_id = None
+        # Blocks of each name
+        self._names = {}
+
+        # Blocks becoming ready are pushed here by Connection.transfer_value, the dispatcher sleeps on it
+        self.ready_queue = queue.Queue()
+
+        self._plan = None
+
+        # Default backend of the block threads, 'thread', 'process', 'asyncio' or 'remote'
+        self.backend = 'thread'
+
+        # ValueStore holding the large arrays of the node values, None to keep them in the nodes
+        self.store = None
 
     def connect_nodes(self, node_in: Node, node_out: Node) -> bool:
         """
@@ -383,7 +578,11 @@ class Prairie:
         connection = Connection(node_in, node_out)
 
         if connection:
-            self._connections.append(connection)
+            self._connections[connection] = None
+            if self._connections_by_id is not None:
+                self._connections_by_id[connection.id] = connection
+            self.invalidate_plan()
+            self.mark_dirty(connection.block_out())
         else:
             print('nodes connection failed')
 
@@ -397,19 +596,123 @@ class Prairie:
 
     def delete_block(self, block: Block):
         if block in self._blocks:
+            for connection in block.connections_out():
+                self.mark_dirty(connection.block_out())
+
             for connection in block.connections():
                 if connection.disconnect():
-                    self._connections.remove(connection)
+                    del self._connections[connection]
+                    if self._connections_by_id is not None and \
+                            self._connections_by_id.get(connection.id) is connection:
+                        del self._connections_by_id[connection.id]
                 else:
                     return False
 
-            self._blocks.remove(block)
+            if self._blocks_by_id is not None and self._blocks_by_id.get(block.id) is block:
+                del self._blocks_by_id[block.id]
+            self.unindex_name(block, block.name)
+            del self._blocks[block]
+            block.prairie = None
+            self.invalidate_plan()
         else:
             return False
 
     def add_block(self, block: Block):
-        if isinstance(block, Block):
-            self._blocks.append(block)
+        if isinstance(block, Block) and block not in self._blocks:
+            self._rank += 1
+            self._blocks[block] = self._rank
+            if self._blocks_by_id is not None:
+                self._blocks_by_id[block.id] = block
+            self.index_name(block)
+            block.prairie = self
+            self.invalidate_plan()
+
+    def reindex_block(self, block: Block, old_id: str = None, old_name: str = None):
+        """
+        Update the indexes of the blocks once the id or the name of a block changed
+
+        :param block: block of the prairie
+        :param old_id: id the block had, None if it did not change
+        :param old_name: name the block had, None if it did not change
+        """
+        if old_id is not None and self._blocks_by_id is not None and self._blocks_by_id.get(old_id) is block:
+            del self._blocks_by_id[old_id]
+            self._blocks_by_id[block.id] = block
+        if old_name is not None:
+            self.unindex_name(block, old_name)
+            self.index_name(block)
+
+    def index_name(self, block: Block):
+        self._names.setdefault(block.name, {})[block] = None
+        indexed = self._blocks_by_name.get(block.name)
+        if indexed is None or self._blocks[indexed] < self._blocks[block]:
+            self._blocks_by_name[block.name] = block
+
+    def unindex_name(self, block: Block, name: str):
+        named = self._names[name]
+        del named[block]
+        if not named:
+            del self._names[name]
+            del self._blocks_by_name[name]
+        elif self._blocks_by_name[name] is block:
+            # The block added last among the others with this name
+            self._blocks_by_name[name] = max(named, key=self._blocks.get)
+
+    def reindex_connection(self, connection, old_id: str):
+        """
+        Update the index of the connections once the id of a connection changed
+
+        :param connection: connection of the prairie
+        :param old_id: id the connection had
+        """
+        if self._connections_by_id is not None and self._connections_by_id.get(old_id) is connection:
+            del self._connections_by_id[old_id]
+            self._connections_by_id[connection.id] = connection
+
+    def plan(self) -> ExecutionPlan:
+        """
+        Return the execution plan of the prairie, compiled once per graph change
+
+        :return: ExecutionPlan
+        :raise CycleError: if the prairie contains a cycle
+        """
+        if self._plan is None:
+            self._plan = compile_plan(self)
+        return self._plan
+
+    def invalidate_plan(self):
+        self._plan = None
+
+    def mark_dirty(self, block: Block):
+        """
+        Mark a block and all the blocks downstream of it as dirty. A dirty block only has dirty blocks downstream, so
+        the propagation stops at the blocks already dirty.
+
+        :param block: block whose inputs changed
+        """
+        block.dirty = True
+        blocks = [connection.block_out() for connection in block.connections_out()]
+        while blocks:
+            block = blocks.pop()
+            if not block.dirty:
+                block.dirty = True
+                blocks += [connection.block_out() for connection in block.connections_out()]
+
+    def dirty_blocks(self) -> list:
+        return [block for block in self._blocks if block.dirty]
+
+    def reset_ready_queue(self, blocks: list = None):
+        """
+        Empty the ready queue and push the blocks that are ready at the start of a run
+
+        :param blocks: blocks that can be pushed, all the blocks of the prairie by default
+        """
+        while not self.ready_queue.empty():
+            self.ready_queue.get_nowait()
+
+        for block in self._blocks if blocks is None else blocks:
+            block._ready = False
+            block.notify_ready()
 
     def describe_connection(self):
         return {connection.node_in.block.name + '__' +
@@ -418,13 +721,38 @@ class Prairie:
 
     @property
     def blocks(self):
-        return {block.name: block for block in self._blocks}
+        """
+        Return the blocks by name, as a read-only view kept up to date
+
+        :return: mapping from block name to block
+        """
+        return MappingProxyType(self._blocks_by_name)
+
+    def iter_blocks(self):
+        """
+        Iterate over the blocks in the order they were added, without generating their ids
+
+        :return: iterator of Block
+        """
+        return iter(self._blocks)
+
+    def iter_connections(self):
+        """
+        Iterate over the connections in the order they were made, without generating their ids
+
+        :return: iterator of Connection
+        """
+        return iter(self._connections)
 
     def connections_id(self):
-        return {connection.id: connection for connection in self._connections}
+        if self._connections_by_id is None:
+            self._connections_by_id = {connection.id: connection for connection in self._connections}
+        return MappingProxyType(self._connections_by_id)
 
     def blocks_id(self):
-        return {block.id: block for block in self._blocks}
+        if self._blocks_by_id is None:
+            self._blocks_by_id = {block.id: block for block in self._blocks}
+        return MappingProxyType(self._blocks_by_id)
 
     def remove_connection(self, connection):
         pass
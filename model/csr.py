@@ -0,0 +1,117 @@
+"""
+csr.py holds the readiness of the blocks of a run in NumPy arrays, for prairies too large to count the ready inputs
+node by node. An ArrayGraph is compiled from an ExecutionPlan, whose positions and slots are the rows of its arrays:
+- indptr, indices: adjacency in CSR form, the slots of the input nodes fed by the outgoing connections of the block at
+  position p being indices[indptr[p]:indptr[p + 1]]
+- slot_block: position of the block of each input node
+- slot_ready: weather each node is ready
+- pending: number of input nodes not ready of each block
+
+When a batch of blocks completes, the input nodes they feed are marked ready and the pending counters of their blocks
+decremented at once with np.add.at, the blocks reaching 0 being the next ready set. The values stay in the nodes: the
+blocks, nodes and connections remain the model, the ArrayGraph only replaces Block.notify_ready during a run.
+
+Examples :
+
+    input ---- add ---- sinus ---- output        pending at the start: input 0, add 2, sinus 1, output 1
+          /                                      complete([input, b]): add 0, ready: [add]
+    b ----
+"""
+
+import itertools
+
+import numpy as np
+
+
+def distinct(values: np.ndarray, ranks: np.ndarray) -> np.ndarray:
+    """
+    Remove the repetitions of values in linear time, unlike np.unique which sorts them. Each value is written its rank in
+    ranks, and only the last of its occurrences reads its own rank back.
+
+    :param values: array of indexes
+    :param ranks: scratch array, indexed by the values
+    :return: values without repetitions
+    """
+    if len(values) < 2:
+        return values
+    order = np.arange(len(values))
+    ranks[values] = order
+    return values[ranks[values] == order]
+
+
+class ArrayGraph:
+
+    def __init__(self, plan):
+        """
+        An ArrayGraph counts the input nodes ready of the blocks of an ExecutionPlan
+
+        :param plan: ExecutionPlan of the prairie, the ArrayGraph having to be compiled again when it changes
+        """
+        self.plan = plan
+        blocks = len(plan.blocks)
+
+        input_counts = np.fromiter(map(len, plan.inputs), dtype=np.intp, count=blocks)
+        self.input_slots = np.fromiter(itertools.chain.from_iterable(plan.inputs), dtype=np.intp,
+                                       count=int(input_counts.sum()))
+        self.slot_block = np.full(len(plan.nodes), -1, dtype=np.intp)
+        self.slot_block[self.input_slots] = np.repeat(np.arange(blocks, dtype=np.intp), input_counts)
+
+        # Connections to the nodes left out of the plan, not arguments of their function, are not counted
+        rows = [[slot for slot in (plan.slot.get(connection.node_out) for connection in transfers) if slot is not None]
+                for transfers in plan.transfers]
+        self.indptr = np.zeros(blocks + 1, dtype=np.intp)
+        np.cumsum(np.fromiter(map(len, rows), dtype=np.intp, count=blocks), out=self.indptr[1:])
+        self.indices = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.intp, count=int(self.indptr[-1]))
+
+        self.slot_ready = np.zeros(len(plan.nodes), dtype=bool)
+        self.pending = np.zeros(blocks, dtype=np.intp)
+
+        # Written by distinct, indexed by slot and by position
+        self._slot_ranks = np.zeros(len(plan.nodes), dtype=np.intp)
+        self._block_ranks = np.zeros(blocks, dtype=np.intp)
+
+    def reset(self, positions, slot_ready) -> np.ndarray:
+        """
+        Start a run: count the input nodes not ready of each block. The blocks not run are given one more than they
+        can reach, so that they never become ready.
+
+        :param positions: positions of the blocks to run
+        :param slot_ready: weather each node is ready at the start of the run, by slot
+        :return: positions of the blocks to run that are already ready
+        """
+        self.slot_ready = np.fromiter(slot_ready, dtype=bool, count=len(self.slot_ready))
+        unready = self.input_slots[~self.slot_ready[self.input_slots]]
+        self.pending = np.bincount(self.slot_block[unready], minlength=len(self.pending)).astype(np.intp)
+
+        idle = np.ones(len(self.pending), dtype=bool)
+        idle[np.fromiter(positions, dtype=np.intp)] = False
+        self.pending[idle] += 1
+
+        return np.flatnonzero(self.pending == 0)
+
+    def complete(self, positions) -> np.ndarray:
+        """
+        Mark ready the input nodes fed by blocks whose outputs have been transferred
+
+        :param positions: positions of the blocks
+        :return: positions of the blocks that became ready
+        """
+        positions = np.array(positions, dtype=np.intp)
+        if len(positions) == 1:
+            slots = self.indices[self.indptr[positions[0]]:self.indptr[positions[0] + 1]]
+        else:
+            # Gather the rows of the blocks: the offset of each edge is the start of its row plus its rank in the row
+            starts = self.indptr[positions]
+            lengths = self.indptr[positions + 1] - starts
+            ends = np.cumsum(lengths)
+            offsets = np.repeat(starts - ends + lengths, lengths) + np.arange(ends[-1] if len(ends) else 0)
+            slots = self.indices[offsets]
+
+        # A node fed twice, or already ready, becomes ready once
+        slots = distinct(slots[~self.slot_ready[slots]], self._slot_ranks)
+        self.slot_ready[slots] = True
+        touched = self.slot_block[slots]
+        np.add.at(self.pending, touched, -1)
+
+        # A block appears once per input node that became ready
+        return distinct(touched[self.pending[touched] == 0], self._block_ranks)
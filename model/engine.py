@@ -0,0 +1,826 @@
+"""
+engine.py runs a Prairie independently of the GUI framework: it is used by the Controller through a QThread, and by
+the command line runner without any Qt import.
+
+The Engine dispatches the blocks from the ready queue of the prairie. Connection.transfer_value pushes a block on this
+queue when its input nodes are ready, and the futures returned by the backends push their completion on it, so that
+the model is only modified by the thread running Engine.run. With array_graph, the ready inputs are counted by an
+ArrayGraph instead, for all the completions received at once, see csr.py.
+
+At most one block per worker runs on the thread and process backends, and at most one block per thread of the worker
+daemons on the remote backend, each pool being counted separately. The blocks ready beyond that wait in a priority
+queue per pool, the block with the longest critical path, estimated from the durations of the previous runs, being
+dispatched first. The blocks on the asyncio backend and the stream stages, which do not occupy a worker, are dispatched
+as soon as they are ready.
+
+Events emitted by the Engine, to which callbacks can be connected:
+- 'queued': (block) the block is ready and waits for a worker
+- 'started': (block) the function of the block has been submitted to its backend. The blocks of a fused chain after the
+  first one are reported started, executed and done one after the other when the chain task is over.
+- 'executed': (block, worker, start, end) the function of the block ran on the thread, process or remote worker named
+  worker, from start to end in time.perf_counter seconds. Emitted before 'done' or 'failed', for the blocks whose backend
+  measures the runs, the blocks of a fused chain running one after the other on the worker of the chain.
+- 'done': (block, output) the output nodes of the block have been set, output being the list of returned values
+- 'failed': (block, exception) the function of the block raised, or exceeded its timeout
+- 'cancelled': (block) the block was running when the run has been cancelled
+- 'transferred': (connection) the value of the connection has been transferred to its output node
+"""
+
+from collections import namedtuple
+import concurrent.futures
+import heapq
+import itertools
+import os
+import queue
+import time
+
+from model.backends import AsyncioBackend, ProcessBackend, ThreadBackend
+from model.blocks import InputBlock
+from model.cache import DiskCache, ResultCache, result_key
+from model.cancel import CancellationToken
+from model.core import Block, Prairie
+from model.csr import ArrayGraph
+from model.fusion import find_chains
+from model.remote import RemoteBackend
+from model.schedule import DurationHistory, critical_path
+from model.stream import Stream, StreamError, start_stage
+from model.sweep import submit_batch
+
+
+Completion = namedtuple('Completion', ['block', 'future'])
+
+_MISSING = object()
+
+
+class Engine:
+
+    def __init__(self, prairie: Prairie, max_workers: int = None, cache: ResultCache = None,
+                 disk_cache: DiskCache = None, stream_buffer: int = 4, free_values: bool = False,
+                 fuse: bool = False, durations: DurationHistory = None, remote_workers: list = None,
+                 array_graph: bool = False):
+        """
+        An Engine runs the blocks of a prairie on their backend, following the execution plan of the prairie. The
+        backends are kept from one run to the other, their workers are started once per engine.
+
+        :param prairie: Prairie to run
+        :param max_workers: number of threads and of processes of the backends, the number of processors by default
+        :param cache: in memory cache of the block results, None to always run the blocks
+        :param disk_cache: on disk cache of the block results, shared across sessions
+        :param stream_buffer: number of chunks a connection of a stream holds before its producer waits
+        :param free_values: free the values of the output nodes once all their consumers ran, except the values
+        displayed by output and chart blocks and the pinned nodes. The blocks freed run again at the next run.
+        :param fuse: run the linear chains of blocks as single tasks, when the results are not cached
+        :param durations: execution times of the functions at the previous runs, ranking the ready blocks by critical
+        path when more blocks are ready than there are workers
+        :param remote_workers: (host, port) of the worker daemons running the blocks on the 'remote' backend. At most
+        as many remote blocks as the workers have threads run at the same time, besides the max_workers blocks of the
+        thread and process backends.
+        :param array_graph: count the ready inputs of the blocks in the arrays of an ArrayGraph rather than in their
+        nodes, finding the blocks made ready by a batch of completions at once. Meant for very large prairies.
+        """
+        self.prairie = prairie
+        self.cache = cache
+        self.disk_cache = disk_cache
+        self.stream_buffer = stream_buffer
+        self.free_values = free_values
+        self.fuse = fuse
+        self.array_graph = array_graph
+        self.durations = durations if durations is not None else DurationHistory()
+        self.max_in_flight = max_workers or os.cpu_count() or 1
+
+        self.backends = {'thread': ThreadBackend(max_workers),
+                         'process': ProcessBackend(max_workers),
+                         'asyncio': AsyncioBackend(),
+                         'remote': RemoteBackend(remote_workers or [])}
+        self.callbacks = {'queued': [], 'started': [], 'executed': [], 'done': [], 'failed': [], 'cancelled': [],
+                          'transferred': []}
+
+        self.errors = {}
+        self._keys = {}
+        self._streams = []
+        self._streaming = set()
+        self._chains = {}
+        self._started = {}
+        self._tokens = {}
+        # ArrayGraph of the last plan run, and positions of the blocks whose outputs have been transferred since the
+        # ArrayGraph last counted the ready inputs
+        self._graph = None
+        self._transferred = []
+        # Positions of the blocks of the current run, None for all of them
+        self._needed = None
+
+        self.token = CancellationToken()
+
+    def connect(self, event: str, callback):
+        """
+        Call callback each time event is emitted
+
+        :param event: 'queued', 'started', 'executed', 'done', 'failed', 'cancelled' or 'transferred'
+        :param callback: function called with the arguments of the event
+        """
+        self.callbacks[event].append(callback)
+
+    def notify(self, event: str, *args):
+        for callback in self.callbacks[event]:
+            callback(*args)
+
+    def transfer(self, connection):
+        if self.array_graph:
+            # The node is marked ready by the ArrayGraph, see propagate
+            connection.node_out.share_value(connection.node_in)
+        else:
+            connection.transfer_value()
+        self.notify('transferred', connection)
+
+    def transfer_outputs(self, plan, position: int):
+        """
+        Transfer the values of the output nodes of a block to the blocks downstream
+
+        :param plan: ExecutionPlan of the prairie
+        :param position: position of the block in the plan
+        """
+        for connection in plan.transfers[position]:
+            self.transfer(connection)
+        if self.array_graph and plan.transfers[position]:
+            self._transferred.append(position)
+
+    def reset_ready(self, plan, positions: list):
+        """
+        Empty the ready queue and push the blocks to run that are ready at the start of a run
+
+        :param plan: ExecutionPlan of the prairie
+        :param positions: positions of the blocks to run
+        """
+        if not self.array_graph:
+            self.prairie.reset_ready_queue([plan.blocks[position] for position in positions])
+            return
+
+        if self._graph is None or self._graph.plan is not plan:
+            self._graph = ArrayGraph(plan)
+
+        self.prairie.reset_ready_queue([])
+        for position in self._graph.reset(positions, (node.ready for node in plan.nodes)):
+            self.prairie.ready_queue.put(plan.blocks[position])
+
+    def propagate(self) -> list:
+        """
+        Count at once the inputs made ready by the outputs transferred since the last call
+
+        :return: positions of the blocks that became ready
+        """
+        positions, self._transferred = self._transferred, []
+        return self._graph.complete(positions).tolist()
+
+    def run(self, incremental: bool = True, targets: list = None):
+        """
+        Run the blocks of the prairie until no block is ready nor running
+
+        :param incremental: only run the dirty blocks, the clean blocks feeding them with the values they retained
+        :param targets: blocks whose values are requested, typically output and chart blocks. Only them and the blocks
+        they depend on run, the other blocks stay dirty. None to run all the blocks.
+        :raise CycleError: if the prairie contains a cycle
+        """
+        plan = self.prairie.plan()
+        ready_queue = self.prairie.ready_queue
+
+        # Positions of the blocks to run, None for all of them
+        needed = None
+        if targets is not None:
+            needed = plan.upstream(plan.index[block] for block in targets)
+        self._needed = needed
+
+        self.errors = {}
+        self.token = CancellationToken()
+        self._transferred = []
+
+        if incremental:
+            # A stream is read once, the blocks streaming to a dirty block have to stream again
+            for position in reversed(range(len(plan.blocks))):
+                block = plan.blocks[position]
+                if not block.dirty and any(plan.blocks[consumer].dirty for consumer in plan.consumers[position]) \
+                        and any(isinstance(node.value, Stream) for node in plan.output_nodes(position)):
+                    self.prairie.mark_dirty(block)
+
+            self.reset_ready(plan, [position for position, block in enumerate(plan.blocks)
+                                    if block.dirty and (needed is None or position in needed)])
+            for position, block in enumerate(plan.blocks):
+                if not block.dirty:
+                    for connection in plan.transfers[position]:
+                        if connection.block_out().dirty:
+                            self.transfer(connection)
+                    if self.array_graph:
+                        self._transferred.append(position)
+        else:
+            for block in plan.blocks:
+                block.dirty = True
+            self.reset_ready(plan, [position for position in range(len(plan.blocks))
+                                    if needed is None or position in needed])
+
+        # Number of consumers still to run of each block, the values of a block being freed when it reaches 0
+        remaining = None
+        freed = []
+        if self.free_values:
+            remaining = [sum(plan.blocks[consumer].dirty and (needed is None or consumer in needed)
+                             for consumer in plan.consumers[position])
+                         for position in range(len(plan.blocks))]
+
+        chains = self.find_chains(plan, needed) if self.fuse else {}
+
+        # Blocks ready to be dispatched in each pool, the block with the longest critical path first
+        ranks = critical_path(plan, self.durations)
+        ready = {pool: [] for pool in (None, 'workers', 'remote')}
+        sequence = itertools.count()
+        # Future of each block running, a completion of a future no longer in it being discarded
+        inflight = {}
+        # Blocks running in each pool of workers, at most capacity(pool)
+        throttled = {'workers': set(), 'remote': set()}
+        # (deadline, sequence, block) of the blocks running with a timeout
+        deadlines = []
+
+        while inflight or any(ready.values()) or self._transferred or not ready_queue.empty():
+            if self.token.cancelled:
+                self.abort(plan, inflight, chains)
+                break
+
+            # Once the completions received are all handled, so that they are counted as a batch
+            if self._transferred and ready_queue.empty():
+                for position in self.propagate():
+                    block = plan.blocks[position]
+                    heapq.heappush(ready[self.pool(block, plan.arguments(position))],
+                                   (-ranks[position], next(sequence), block))
+                    self.notify('queued', block)
+                continue
+
+            if deadlines and deadlines[0][0] <= time.monotonic():
+                self.expire(plan, deadlines, inflight, throttled, chains)
+                continue
+
+            dispatchable = self.dispatchable(ready, throttled)
+            timeout = max(0., deadlines[0][0] - time.monotonic()) if deadlines else None
+            try:
+                item = ready_queue.get(block=dispatchable is None, timeout=timeout)
+            except queue.Empty:
+                if dispatchable is not None:
+                    block = heapq.heappop(dispatchable)[2]
+                    self.dispatch(plan, block, chains, inflight, throttled)
+                    if block.thread.timeout is not None:
+                        heapq.heappush(deadlines, (time.monotonic() + block.thread.timeout, next(sequence), block))
+                continue
+
+            if isinstance(item, Completion):
+                if inflight.get(item.block) is not item.future:
+                    # Block which timed out, or block of a cancelled run
+                    continue
+                del inflight[item.block]
+                for running in throttled.values():
+                    running.discard(item.block)
+                self._tokens.pop(item.block, None)
+                start = self._started.pop(item.block, None)
+                if start is not None and item.future.exception() is None:
+                    self.durations.record(item.block, time.perf_counter() - start)
+                for block in self.complete(plan, item.block, item.future):
+                    if remaining is not None:
+                        freed += self.release(plan, block, remaining)
+
+            elif isinstance(item, Block):
+                if needed is not None and plan.index[item] not in needed:
+                    # Fed by a requested block, but not requested
+                    continue
+                position = plan.index[item]
+                heapq.heappush(ready[self.pool(item, plan.arguments(position))],
+                               (-ranks[position], next(sequence), item))
+                self.notify('queued', item)
+
+        self.durations.save()
+        self._streams = []
+
+        # Marked once the run is over, so that the blocks that ran after them are marked too
+        for block in freed:
+            self.prairie.mark_dirty(block)
+
+    def dispatch(self, plan, block: Block, chains: dict, inflight: dict, throttled: dict, notify: bool = True):
+        """
+        Submit a block, or the chain of blocks it starts, and push its completion on the ready queue when it is done
+
+        :param plan: ExecutionPlan of the prairie
+        :param block: Block to run
+        :param chains: chains of the plan, by position of their first block
+        :param inflight: future of each block running, updated in place
+        :param throttled: blocks running in each pool of workers, updated in place
+        :param notify: emit the 'started' event
+        """
+        position = plan.index[block]
+        args = plan.arguments(position)
+        batched = self.batched_arguments(plan, position)
+        chain = chains.get(position)
+
+        if chain is not None and not any(batched) and not self.streaming(block, args):
+            # The next blocks of the chain are reported started as their turn comes, see complete_chain
+            future = self.submit_chain(plan, chain, args)
+        elif self.streaming(block, args):
+            # Stream stages wait for each other, they all have to run at the same time
+            future = self.start_stream(plan, block, args)
+        else:
+            future = self.submit(block, args, batched, self.keyword_arguments(block))
+            if block.execution_backend() != 'asyncio' and not future.done():
+                self._started[block] = time.perf_counter()
+
+        pool = self.pool(block, args)
+        if pool is not None:
+            throttled[pool].add(block)
+        inflight[block] = future
+        if notify:
+            self.notify('started', block)
+
+        ready_queue = self.prairie.ready_queue
+        future.add_done_callback(lambda done: ready_queue.put(Completion(block, done)))
+
+    def pool(self, block: Block, args: list) -> str:
+        """
+        Return the pool of workers a block occupies while it runs, the blocks of a pool being throttled to its capacity
+
+        :param block: Block to run
+        :param args: arguments of the function
+        :return: 'workers' for the thread and process backends, 'remote' for the remote backend, None for the asyncio
+        backend and the stream stages, which wait without occupying a worker
+        """
+        backend = block.execution_backend()
+        if backend == 'asyncio' or self.streaming(block, args):
+            return None
+        return 'remote' if backend == 'remote' else 'workers'
+
+    def capacity(self, pool: str) -> int:
+        """
+        Return the number of blocks of a pool that can run at the same time
+
+        :param pool: 'workers' or 'remote'
+        :return: max_in_flight for the thread and process backends, the number of threads of the connected workers for
+        the remote backend, at least 1 so that the remote blocks fail when no worker can be reached
+        """
+        if pool == 'remote':
+            return max(self.backends['remote'].capacity, 1)
+        return self.max_in_flight
+
+    def dispatchable(self, ready: dict, throttled: dict) -> list:
+        """
+        Return the heap of ready blocks to dispatch from: the first pool with a block ready and a free worker
+
+        :param ready: heap of the ready blocks of each pool
+        :param throttled: blocks running in each pool
+        :return: heap of (-rank, sequence, block), None if no block can be dispatched
+        """
+        for pool, heap in ready.items():
+            if heap and (pool is None or len(throttled[pool]) < self.capacity(pool)):
+                return heap
+        return None
+
+    def keyword_arguments(self, block: Block) -> dict:
+        """
+        Return the keyword arguments given by the engine to the function of a block: its CancellationToken if the
+        function has a cancel_token keyword argument, except on the process and remote backends where it cannot be sent
+
+        :param block: Block to run
+        :return: dictionary of keyword arguments
+        """
+        signature = getattr(block, 'function_signature', {})
+        if 'cancel_token' not in signature.get('kwargs', {}) or block.execution_backend() in ('process', 'remote'):
+            return {}
+
+        token = CancellationToken(self.token)
+        self._tokens[block] = token
+        return {'cancel_token': token}
+
+    def cancel(self):
+        """
+        Stop the current run, from any thread: no block is dispatched anymore, the running blocks are abandoned after
+        their cancel token has been cancelled, and the worker processes are terminated
+        """
+        self.token.cancel()
+        # Wakes up the dispatcher
+        self.prairie.ready_queue.put(None)
+
+    def abort(self, plan, inflight: dict, chains: dict):
+        for stream in self._streams:
+            stream.abort()
+
+        if any(block.execution_backend() == 'process' for block in inflight):
+            self.backends['process'].kill()
+
+        for block, future in inflight.items():
+            future.cancel()
+            self._started.pop(block, None)
+            self._keys.pop(block, None)
+            self._chains.pop(block, None)
+            self.notify('cancelled', block)
+        inflight.clear()
+        self._tokens.clear()
+        self._streaming.clear()
+
+        # The blocks that had received part of their inputs wait for all of them again at the next run
+        for block in plan.blocks:
+            if not isinstance(block, InputBlock):
+                block.initialize_in_nodes()
+
+    def expire(self, plan, deadlines: list, inflight: dict, throttled: dict, chains: dict):
+        """
+        Fail the blocks running beyond their timeout. A block on the process backend is stopped by terminating the
+        worker processes, the other blocks running on them being submitted again.
+
+        :param plan: ExecutionPlan of the prairie
+        :param deadlines: heap of (deadline, sequence, block), updated in place
+        :param inflight: future of each block running, updated in place
+        :param throttled: blocks running in each pool of workers, updated in place
+        :param chains: chains of the plan, by position of their first block
+        """
+        now = time.monotonic()
+        while deadlines and deadlines[0][0] <= now:
+            block = heapq.heappop(deadlines)[2]
+            future = inflight.pop(block, None)
+            if future is None:
+                continue
+
+            future.cancel()
+            throttled['workers'].discard(block)
+            throttled['remote'].discard(block)
+            self._started.pop(block, None)
+            self._keys.pop(block, None)
+            self._chains.pop(block, None)
+            token = self._tokens.pop(block, None)
+            if token is not None:
+                token.cancel()
+
+            if block.execution_backend() == 'process':
+                killed = [other for other in inflight if other.execution_backend() == 'process']
+                self.backends['process'].kill()
+                for other in killed:
+                    throttled['workers'].discard(other)
+                    self._chains.pop(other, None)
+                    self.dispatch(plan, other, chains, inflight, throttled, notify=False)
+
+            self.fail(block, TimeoutError(block.name + ' exceeded its timeout of ' + str(block.thread.timeout) + ' s'))
+
+    def find_chains(self, plan, needed: frozenset = None) -> dict:
+        """
+        Find the chains of blocks of the plan that can run as single tasks: blocks on the thread, process or remote
+        backend, which are neither coroutines, generators nor input blocks in sweep mode, and have no timeout, and only
+        if results are not cached. A block with a timeout runs alone, so that its deadline is its own.
+
+        :param plan: ExecutionPlan of the prairie
+        :param needed: positions of the blocks to run, None for all of them
+        :return: dictionary from the position of the first block of each chain to the Chain
+        """
+        if self.cache is not None or self.disk_cache is not None:
+            return {}
+
+        def fusable(position):
+            if needed is not None and position not in needed:
+                return False
+            block = plan.blocks[position]
+            signature = getattr(block, 'function_signature', None)
+            return bool(signature) and not signature.get('coroutine', False) and \
+                not signature.get('generator', False) and not getattr(block, 'sweep', False) and \
+                block.thread.timeout is None and block.execution_backend() in ('thread', 'process', 'remote')
+
+        return find_chains(plan, fusable)
+
+    def submit_chain(self, plan, chain, args: list) -> concurrent.futures.Future:
+        """
+        Submit the functions of a chain of blocks to their backend, as a single task
+
+        :param plan: ExecutionPlan of the prairie
+        :param chain: Chain to run
+        :param args: arguments of the function of the first block
+        :return: future of the outputs of the functions and of the exception that stopped the chain
+        """
+        block = plan.blocks[chain.positions[0]]
+        self._chains[block] = chain
+        return self.backends[block.execution_backend()].submit_chain(chain.steps(plan), args)
+
+    def release(self, plan, block: Block, remaining: list) -> list:
+        """
+        Free the input values of a block that ran, and the output values of its producers whose consumers all ran
+
+        :param plan: ExecutionPlan of the prairie
+        :param block: Block that ran
+        :param remaining: number of consumers still to run of each block, decremented in place
+        :return: producers whose values have been freed
+        """
+        position = plan.index[block]
+        freed = []
+
+        if block.type not in ('output', 'chart'):
+            for slot in plan.inputs[position]:
+                node = plan.nodes[slot]
+                if node.is_connected():
+                    node.set_value(None)
+
+        for producer in plan.producers[position]:
+            remaining[producer] -= 1
+            if remaining[producer] == 0 and self.free_outputs(plan, producer):
+                freed.append(plan.blocks[producer])
+
+        return freed
+
+    @staticmethod
+    def free_outputs(plan, position: int) -> bool:
+        """
+        Free the values of the output nodes of a block, except the pinned ones and the ones displayed by output and
+        chart blocks
+
+        :param plan: ExecutionPlan of the prairie
+        :param position: position of the block in the plan
+        :return: weather a value has been freed
+        """
+        freed = False
+        for node in plan.output_nodes(position):
+            if node.pinned or any(connection.block_out().type in ('output', 'chart')
+                                  for connection in node.connections):
+                continue
+            node.set_value(None)
+            freed = True
+        return freed
+
+    def submit(self, block: Block, args: list, batched: list, kwargs: dict = None) -> concurrent.futures.Future:
+        """
+        Submit the function of a block to its backend, or return its cached output
+
+        :param block: Block to run
+        :param args: arguments of the function
+        :param batched: for each argument, weather it is a batch of values of a sweep
+        :param kwargs: keyword arguments of the function
+        :return: future of the function output
+        """
+        thread = block.thread
+
+        if self.cache is not None or self.disk_cache is not None:
+            key = self.result_key(block, args, batched)
+            output = self.cached_output(key)
+            if output is not _MISSING:
+                thread.cache_hits += 1
+                future = concurrent.futures.Future()
+                future.set_result(output)
+                return future
+            thread.cache_misses += 1
+            self._keys[block] = key
+
+        backend = self.backends[block.execution_backend()]
+
+        if any(batched):
+            return submit_batch(backend, thread.script_file, thread.script_function, args, batched,
+                                getattr(block, 'function_signature', {}).get('vectorizable', False))
+
+        if kwargs:
+            return backend.submit(thread.script_file, thread.script_function, args, kwargs)
+        return backend.submit(thread.script_file, thread.script_function, args)
+
+    @staticmethod
+    def streaming(block: Block, args: list) -> bool:
+        """
+        Return weather a block runs chunk by chunk: its function is a generator or one of its arguments is a stream
+
+        :param block: Block to run
+        :param args: arguments of the function
+        :return: boolean
+        """
+        return getattr(block, 'function_signature', {}).get('generator', False) or \
+            any(isinstance(arg, Stream) for arg in args)
+
+    def start_stream(self, plan, block: Block, args: list) -> concurrent.futures.Future:
+        """
+        Start a block on its own thread, reading its streaming arguments chunk by chunk. Except for the output and
+        chart blocks, which return the concatenation of the chunks, the output nodes of the block are set to streams
+        and transferred downstream right away, so that the next blocks start consuming the first chunks.
+
+        :param plan: ExecutionPlan of the prairie
+        :param block: Block to run
+        :param args: arguments of the function
+        :return: future completed when the stream of the block ends
+        """
+        position = plan.index[block]
+        thread = block.thread
+
+        try:
+            args = [arg.reader() if isinstance(arg, Stream) else arg for arg in args]
+        except StreamError as exc:
+            future = concurrent.futures.Future()
+            future.set_exception(exc)
+            return future
+
+        outputs = None
+        if block.type not in ('output', 'chart'):
+            nodes = plan.output_nodes(position)
+            # One reader per consumer of the run, the queue of a consumer left out would fill up and block the stream
+            outputs = [Stream(sum(1 for connection in node.connections
+                                  if self._needed is None or plan.index[connection.block_out()] in self._needed),
+                              self.stream_buffer)
+                       for node in nodes]
+            for node, stream in zip(nodes, outputs):
+                node.set_value(stream)
+            self._streams.extend(outputs)
+            self._streaming.add(block)
+
+        future = start_stage(block.name, self.backends[block.execution_backend()], thread.script_file,
+                             thread.script_function, args, outputs,
+                             getattr(block, 'function_signature', {}).get('generator', False))
+
+        if outputs is not None:
+            block.initialize_in_nodes()
+            self.transfer_outputs(plan, position)
+
+        return future
+
+    @staticmethod
+    def batched_arguments(plan, position: int) -> list:
+        """
+        Return, for each argument of a block, weather it is a batch of values coming from a block in sweep mode
+
+        :param plan: ExecutionPlan of the prairie
+        :param position: position of the block in the plan
+        :return: list of booleans
+        """
+        return [any(connection.block_in().batched for connection in plan.nodes[slot].connections)
+                for slot in plan.inputs[position]]
+
+    @staticmethod
+    def result_key(block: Block, args: list, batched: list) -> str:
+        if any(batched):
+            args = args + [tuple(batched)]
+        return result_key(block.thread.script_file, block.thread.script_function, args)
+
+    def cached_output(self, key: str):
+        """
+        Look an output up in memory then on disk, outputs found on disk are kept in memory
+
+        :param key: key returned by result_key
+        :return: output, _MISSING if it is not cached
+        """
+        if self.cache is not None:
+            return self.cache.get(key, _MISSING, fallback=self.disk_cache)
+        if self.disk_cache is not None:
+            return self.disk_cache.get(key, _MISSING)
+        return _MISSING
+
+    def warm_start(self, disk_cache: DiskCache = None) -> int:
+        """
+        Set the outputs of the blocks found in the disk cache, following the plan from the input blocks, so that the
+        next incremental run only executes the blocks missing from the cache
+
+        :param disk_cache: DiskCache to look the outputs up in, such as the outputs of a Checkpoint, the caches of the
+        engine by default
+        :return: number of blocks found in the cache
+        """
+        plan = self.prairie.plan()
+        warmed = 0
+
+        for position, block in enumerate(plan.blocks):
+            if not block.dirty or any(plan.blocks[producer].dirty for producer in plan.producers[position]):
+                continue
+
+            args = plan.arguments(position)
+            if self.streaming(block, args):
+                continue
+
+            batched = self.batched_arguments(plan, position)
+            key = self.result_key(block, args, batched)
+            output = self.cached_output(key) if disk_cache is None else disk_cache.get(key, _MISSING)
+            if output is _MISSING:
+                continue
+
+            output = self.set_output(plan, block, output, any(batched))
+            for connection in plan.transfers[position]:
+                connection.node_out.set_value(connection.node_in.value)
+
+            warmed += 1
+            self.notify('done', block, output)
+
+        return warmed
+
+    def complete(self, plan, block: Block, future) -> list:
+        """
+        Set the outputs of a block, or of a chain of blocks, from the future returned by its backend
+
+        :param plan: ExecutionPlan of the prairie
+        :param block: Block submitted, the first block of a chain for a chain
+        :param future: future of the output of the block
+        :return: blocks that ran, successfully or not
+        """
+        chain = self._chains.pop(block, None)
+        if chain is not None:
+            return self.complete_chain(plan, chain, future)
+
+        position = plan.index[block]
+
+        key = self._keys.pop(block, None)
+        batched = self.batched_arguments(plan, position)
+
+        execution = getattr(future, 'execution', None)
+        if execution:
+            self.notify('executed', block, *execution)
+
+        try:
+            output = future.result()
+        except Exception as exc:
+            self._streaming.discard(block)
+            self.fail(block, exc)
+            return [block]
+
+        if block in self._streaming:
+            # Its streams have been transferred when it started
+            self._streaming.discard(block)
+            block.dirty = False
+            self.notify('done', block, [node.value for node in plan.output_nodes(position)])
+            return [block]
+
+        if key is not None:
+            if self.cache is not None:
+                self.cache.put(key, output)
+            if self.disk_cache is not None:
+                self.disk_cache.put(key, output)
+
+        output = self.set_output(plan, block, output, any(batched))
+        block.initialize_in_nodes()
+
+        self.notify('done', block, output)
+
+        # Transferring last so that downstream blocks are pushed on the ready queue with their values set
+        self.transfer_outputs(plan, position)
+
+        return [block]
+
+    def complete_chain(self, plan, chain, future) -> list:
+        try:
+            outputs, error, durations = future.result()
+        except Exception as exc:
+            outputs, error, durations = [], exc, []
+
+        # Measured function by function in the task, so that the blocks of the chain are ranked like the others
+        for position, duration in zip(chain.positions, durations):
+            self.durations.record(plan.blocks[position], duration)
+
+        # The blocks are reported one after the other, in the order their functions ran in the task, the function that
+        # raised running until the end of the task
+        execution = getattr(future, 'execution', None)
+        ran = []
+        for i, position in enumerate(chain.positions[:len(outputs) + (error is not None)]):
+            block = plan.blocks[position]
+            if ran:
+                self.notify('started', block)
+            if execution:
+                worker, start, end = execution
+                step_end = start + durations[i] if i < len(durations) else end
+                self.notify('executed', block, worker, start, step_end)
+                execution = [worker, step_end, end]
+
+            if i == len(outputs):
+                self.fail(block, error)
+                return ran + [block]
+
+            if ran:
+                # The values passed inside the task, set as if they had been transferred
+                for slot in plan.inputs[position]:
+                    node = plan.nodes[slot]
+                    node.share_value(node.connections[-1].node_in)
+
+            output = self.set_output(plan, block, outputs[i], False)
+            block.initialize_in_nodes()
+            ran.append(block)
+            self.notify('done', block, output)
+
+        self.transfer_outputs(plan, chain.positions[-1])
+
+        return ran
+
+    def fail(self, block: Block, exc: Exception):
+        block.initialize_in_nodes()
+        # The blocks reading the streams of this run would wait for chunks that never come
+        for stream in self._streams:
+            stream.abort()
+        self.errors[block] = exc
+        self.notify('failed', block, exc)
+
+    @staticmethod
+    def set_output(plan, block: Block, output, batched: bool) -> list:
+        """
+        Set the output nodes of a block from the output of its function, and mark the block as clean
+
+        :param plan: ExecutionPlan of the prairie
+        :param block: executed block
+        :param output: output of the function
+        :param batched: weather the block received batches of values
+        :return: output as a list of returned values
+        """
+        if isinstance(output, tuple):
+            output = [return_value for return_value in output]
+        else:
+            output = [output]
+
+        for node, value in zip(plan.output_nodes(plan.index[block]), output):
+            node.set_value(value)
+        block.dirty = False
+        block.batched = batched or isinstance(block, InputBlock) and block.sweep
+
+        return output
+
+    def shutdown(self):
+        for backend in self.backends.values():
+            backend.shutdown()
@@ -0,0 +1,108 @@
+"""
+fusion.py collapses the linear chains of an ExecutionPlan into single tasks. In a chain, each block is the only
+consumer of the previous one and the previous one is its only producer, so the whole chain can run as one call on a
+worker: blocks taking microseconds no longer pay one dispatch each.
+
+Examples :
+
+    input ---- add ---- multiply ---- sinus ---- output        one task: input, add, multiply, sinus, output
+
+    input ---- add ---- sinus ---- output                      two tasks: input, add   and   sinus, output
+                  \\
+                   ---- output
+
+The engine still sets the nodes and emits the events of every block of a chain, in order.
+"""
+
+from collections import namedtuple
+import time
+
+from model.compiler import load_function
+
+
+class Chain(namedtuple('Chain', ['positions', 'wiring'])):
+    """
+    Chain of blocks run as a single task
+
+    :param positions: positions of the blocks of the chain in the plan, in execution order
+    :param wiring: for each block after the first, index of the return value of the previous block given to each of
+    its arguments
+    """
+
+    __slots__ = ()
+
+    def steps(self, plan) -> tuple:
+        """
+        Return the calls of the chain, as given to run_chain
+
+        :param plan: ExecutionPlan of the chain
+        :return: tuple of (script_file, script_function, wiring)
+        """
+        return tuple((plan.blocks[position].thread.script_file, plan.blocks[position].thread.script_function, wiring)
+                     for position, wiring in zip(self.positions, (None,) + self.wiring))
+
+
+def find_chains(plan, fusable) -> dict:
+    """
+    Find the chains of at least two blocks of a plan
+
+    :param plan: ExecutionPlan
+    :param fusable: function of a block position, returning weather the block can be part of a chain
+    :return: dictionary from the position of the first block of each chain to the Chain
+    """
+    chains = {}
+    chained = set()
+
+    # In topological order, a chain is always found from its first block
+    for position in range(len(plan.blocks)):
+        if position in chained or not fusable(position):
+            continue
+
+        positions = [position]
+        wiring = []
+        while len(plan.consumers[positions[-1]]) == 1:
+            producer = positions[-1]
+            consumer = plan.consumers[producer][0]
+            if len(plan.producers[consumer]) != 1 or not fusable(consumer) or \
+                    plan.blocks[consumer].execution_backend() != plan.blocks[position].execution_backend():
+                break
+
+            arguments = [plan.nodes[slot] for slot in plan.inputs[consumer]]
+            if not all(node.connections for node in arguments):
+                break
+
+            outputs = plan.outputs[producer]
+            wiring.append(tuple(outputs.index(plan.slot[node.connections[-1].node_in]) for node in arguments))
+            positions.append(consumer)
+
+        if len(positions) > 1:
+            chains[position] = Chain(tuple(positions), tuple(wiring))
+            chained.update(positions)
+
+    return chains
+
+
+def run_chain(steps: tuple, args: list) -> tuple:
+    """
+    Run the functions of a chain one after the other, each one receiving the return values of the previous one
+
+    :param steps: tuple of (script_file, script_function, wiring), the wiring of the first step being None
+    :param args: arguments of the first function
+    :return: outputs of the functions that ran, the exception raised by the next one or None, and the execution time of
+    the functions that ran, in seconds
+    """
+    outputs = []
+    durations = []
+
+    for script_file, script_function, wiring in steps:
+        if wiring is not None:
+            values = outputs[-1] if isinstance(outputs[-1], tuple) else (outputs[-1],)
+            args = [values[i] for i in wiring]
+        start = time.perf_counter()
+        try:
+            outputs.append(load_function(script_file, script_function)(*args))
+        except Exception as exc:
+            return outputs, exc, durations
+        durations.append(time.perf_counter() - start)
+
+    return outputs, None, durations
@@ -0,0 +1,158 @@
+"""
+plan.py compiles a Prairie into an ExecutionPlan, independently of the framework used to run the blocks.
+
+An ExecutionPlan is computed once per graph change and replayed at each run:
+- blocks are sorted in a topological order and grouped in levels of blocks that can run in parallel
+- every node of the prairie is given a slot, so that a block reads its arguments and writes its outputs through
+  precomputed slot indexes rather than rebuilding its nodes dictionaries
+- a graph containing a cycle cannot be compiled, it is rejected before anything runs
+
+Examples :
+
+    input ---- add ---- sinus ---- output        levels: (input,) (add,) (sinus,) (output,)
+
+"""
+
+from collections import namedtuple
+from types import MappingProxyType
+
+
+class CycleError(Exception):
+    pass
+
+
+class ExecutionPlan(namedtuple('ExecutionPlan', ['blocks', 'index', 'levels', 'nodes', 'slot', 'inputs', 'outputs',
+                                                 'producers', 'consumers', 'transfers'])):
+    """
+    Immutable execution plan of a Prairie. Blocks are referred to by their position in the topological order.
+
+    :param blocks: tuple of the blocks in topological order
+    :param index: read-only mapping from a block to its position in blocks
+    :param levels: tuple of levels, each level being a tuple of block positions that can run in parallel
+    :param nodes: tuple of all the nodes of the prairie, a node position being its slot
+    :param slot: read-only mapping from a node to its slot
+    :param inputs: for each block, slots of its input nodes in the order of the function arguments
+    :param outputs: for each block, slots of its output nodes in the order of the function returns
+    :param producers: for each block, positions of the blocks connected upstream
+    :param consumers: for each block, positions of the blocks connected downstream
+    :param transfers: for each block, its outgoing connections
+    """
+
+    __slots__ = ()
+
+    def arguments(self, position: int) -> list:
+        """
+        Return the values of the input nodes of a block, in the order of its function arguments
+
+        :param position: position of the block in the plan
+        :return: list of values
+        """
+        return [self.nodes[slot].value for slot in self.inputs[position]]
+
+    def output_nodes(self, position: int) -> list:
+        """
+        Return the output nodes of a block, in the order of its function returns
+
+        :param position: position of the block in the plan
+        :return: list of nodes
+        """
+        return [self.nodes[slot] for slot in self.outputs[position]]
+
+    def upstream(self, positions) -> frozenset:
+        """
+        Return the positions of blocks and of all the blocks they depend on, walking the connections backwards
+
+        :param positions: positions of the blocks
+        :return: frozenset of positions
+        """
+        closure = set(positions)
+        stack = list(closure)
+        while stack:
+            for producer in self.producers[stack.pop()]:
+                if producer not in closure:
+                    closure.add(producer)
+                    stack.append(producer)
+        return frozenset(closure)
+
+    @property
+    def sources(self) -> tuple:
+        """
+        Return the positions of the blocks without upstream blocks
+
+        :return: tuple of positions
+        """
+        return self.levels[0] if self.levels else ()
+
+
+def _ordered_nodes(block, functional_type: str, signature_key: str) -> list:
+    nodes = block.nodes_in() if functional_type == 'in' else block.nodes_out()
+    signature = getattr(block, 'function_signature', {})
+    try:
+        return [nodes[name] for name in signature[signature_key]]
+    except KeyError:
+        return list(nodes.values())
+
+
+def compile_plan(prairie) -> ExecutionPlan:
+    """
+    Compile a prairie into an ExecutionPlan
+
+    :param prairie: Prairie to compile
+    :return: ExecutionPlan
+    """
+
+    blocks = list(prairie.iter_blocks())
+    block_position = {block: i for i, block in enumerate(blocks)}
+
+    downstream = [[] for _ in blocks]
+    upstream = [[] for _ in blocks]
+    for connection in prairie.iter_connections():
+        block_in = block_position[connection.block_in()]
+        block_out = block_position[connection.block_out()]
+        if block_out not in downstream[block_in]:
+            downstream[block_in].append(block_out)
+            upstream[block_out].append(block_in)
+
+    # Kahn's algorithm, level by level
+    pending = [len(blocks_in) for blocks_in in upstream]
+    level = [i for i, count in enumerate(pending) if count == 0]
+    block_levels = []
+    while level:
+        block_levels.append(level)
+        next_level = []
+        for i in level:
+            for j in downstream[i]:
+                pending[j] -= 1
+                if pending[j] == 0:
+                    next_level.append(j)
+        level = next_level
+
+    order = [i for level in block_levels for i in level]
+    if len(order) < len(blocks):
+        cycle = [blocks[i].name for i, count in enumerate(pending) if count > 0]
+        raise CycleError('prairie contains a cycle through blocks ' + ', '.join(cycle))
+
+    position = {i: p for p, i in enumerate(order)}
+    ordered_blocks = tuple(blocks[i] for i in order)
+
+    nodes = []
+    inputs = []
+    outputs = []
+    for block in ordered_blocks:
+        block_inputs = _ordered_nodes(block, 'in', 'args')
+        block_outputs = _ordered_nodes(block, 'out', 'returns')
+        inputs.append(tuple(range(len(nodes), len(nodes) + len(block_inputs))))
+        nodes += block_inputs
+        outputs.append(tuple(range(len(nodes), len(nodes) + len(block_outputs))))
+        nodes += block_outputs
+
+    return ExecutionPlan(blocks=ordered_blocks,
+                         index=MappingProxyType({block: p for p, block in enumerate(ordered_blocks)}),
+                         levels=tuple(tuple(position[i] for i in level) for level in block_levels),
+                         nodes=tuple(nodes),
+                         slot=MappingProxyType({node: s for s, node in enumerate(nodes)}),
+                         inputs=tuple(inputs),
+                         outputs=tuple(outputs),
+                         producers=tuple(tuple(position[j] for j in upstream[i]) for i in order),
+                         consumers=tuple(tuple(position[j] for j in downstream[i]) for i in order),
+                         transfers=tuple(tuple(block.connections_out()) for block in ordered_blocks))
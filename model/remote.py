@@ -0,0 +1,331 @@
+"""
+remote.py runs the blocks on worker daemons reached over TCP, on other hosts or on other processes of the same host.
+A task only holds the script file, the function name and the arguments of a block, like the tasks of the other
+backends, so a worker needs the same scripts, under the same relative paths, as the coordinator:
+
+    export PRAIRIE_AUTHKEY=...                                              the same secret key on every host
+    python -m prairie worker --host 0.0.0.0 --port 7450 --workers 8        on each host, from the repository root
+    python -m prairie run files/prairies/the_long_example.yml --backend remote --remote host1:7450 --remote host2:7450
+
+The blocks whose backend is 'remote' are sent to the worker with the fewest tasks per thread. Each worker runs them
+on its own ThreadBackend or ProcessBackend and sends the outputs back as they complete, in any order, with the name
+of the thread or process that ran them and the duration of the run.
+
+Messages are pickled over multiprocessing connections authenticated with a shared key, taken from the PRAIRIE_AUTHKEY
+environment variable. Unpickling a message runs arbitrary code: workers listen on localhost by default, and refuse to
+listen on another interface without a key of their own, the default key being public.
+"""
+
+import concurrent.futures
+import ipaddress
+import itertools
+import os
+import pickle
+import socket
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from multiprocessing import AuthenticationError
+
+from model.backends import ProcessBackend, ThreadBackend
+
+DEFAULT_PORT = 7450
+
+
+def default_authkey() -> bytes:
+    return os.environ.get('PRAIRIE_AUTHKEY', 'prairie').encode()
+
+
+def is_loopback(host: str) -> bool:
+    """
+    Return weather a host only designates the local machine
+
+    :param host: host name or IP address
+    :return: boolean
+    """
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        pass
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+def parse_address(address: str) -> tuple:
+    """
+    Parse a HOST:PORT address, the port being DEFAULT_PORT if omitted
+
+    :param address: 'HOST:PORT' or 'HOST'
+    :return: (host, port)
+    """
+    host, _, port = address.rpartition(':')
+    if not host:
+        return port, DEFAULT_PORT
+    return host, int(port)
+
+
+def serve(host: str = 'localhost', port: int = DEFAULT_PORT, max_workers: int = None, backend: str = 'thread',
+          authkey: bytes = None):
+    """
+    Run a worker daemon: accept coordinators and run the tasks they send until interrupted
+
+    :param host: interface to listen on, localhost by default so that only local coordinators can connect
+    :param port: port to listen on
+    :param max_workers: number of tasks run at the same time, the number of processors by default
+    :param backend: 'thread' or 'process', backend running the tasks on the worker
+    :param authkey: key shared with the coordinators, default_authkey() by default
+    :raise PermissionError: if the host is not a loopback address and no key is given, neither in authkey nor in the
+    PRAIRIE_AUTHKEY variable
+    """
+    if authkey is None and 'PRAIRIE_AUTHKEY' not in os.environ and not is_loopback(host):
+        raise PermissionError('a worker listening on ' + host + ' runs the code of anyone reaching it, set a secret '
+                              'key in the PRAIRIE_AUTHKEY variable')
+
+    max_workers = max_workers or os.cpu_count() or 1
+    runner = ProcessBackend(max_workers) if backend == 'process' else ThreadBackend(max_workers)
+
+    with Listener((host, port), authkey=authkey or default_authkey()) as listener:
+        print('prairie worker listening on', host + ':' + str(port), 'with', max_workers, backend, 'workers',
+              file=sys.stderr)
+        try:
+            while True:
+                try:
+                    connection = listener.accept()
+                except (AuthenticationError, OSError, EOFError) as exc:
+                    print('connection refused:', repr(exc), file=sys.stderr)
+                    continue
+                threading.Thread(target=handle_coordinator, args=(connection, runner, max_workers),
+                                 daemon=True).start()
+        finally:
+            runner.shutdown()
+
+
+def handle_coordinator(connection, runner, max_workers: int):
+    """
+    Run the tasks sent by one coordinator, until it disconnects
+
+    :param connection: multiprocessing connection to the coordinator
+    :param runner: ThreadBackend or ProcessBackend running the tasks
+    :param max_workers: number of tasks run at the same time, announced to the coordinator
+    """
+    lock = threading.Lock()
+
+    def reply(task_id, future):
+        execution = None
+        if future.execution:
+            worker, start, end = future.execution
+            execution = (worker, end - start)
+        try:
+            message = ('result', task_id, future.result(), execution)
+        except Exception as exc:
+            message = ('error', task_id, exc, execution)
+
+        with lock:
+            try:
+                connection.send(message)
+            except (pickle.PicklingError, TypeError, AttributeError) as exc:
+                connection.send(('error', task_id, RuntimeError('output not picklable: ' + repr(exc)), execution))
+            except OSError:
+                # Coordinator gone
+                pass
+
+    with lock:
+        connection.send(('hello', max_workers))
+
+    try:
+        while True:
+            message = connection.recv()
+            if message[0] == 'task':
+                _, task_id, script_file, script_function, args, kwargs = message
+                future = runner.submit(script_file, script_function, args, kwargs)
+            elif message[0] == 'chain':
+                _, task_id, steps, args = message
+                future = runner.submit_chain(steps, args)
+            else:
+                continue
+            future.add_done_callback(lambda done, task_id=task_id: reply(task_id, done))
+    except (EOFError, OSError):
+        pass
+    finally:
+        connection.close()
+
+
+class RemoteWorker:
+
+    def __init__(self, address: tuple, authkey: bytes):
+        """
+        A RemoteWorker is the connection of a coordinator to a worker daemon, and the futures of the tasks it runs
+
+        :param address: (host, port) of the worker
+        :param authkey: key shared with the worker
+        :raise ConnectionError: if the worker cannot be reached
+        """
+        self.address = address
+        self.name = address[0] + ':' + str(address[1])
+        self.pending = {}
+        self.closed = False
+
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+
+        try:
+            self._connection = Client(address, authkey=authkey)
+            self.capacity = self._connection.recv()[1]
+        except (OSError, EOFError, AuthenticationError) as exc:
+            raise ConnectionError('cannot reach the worker at ' + str(address) + ': ' + repr(exc))
+
+        self._receiver = threading.Thread(target=self.receive, name='prairie-remote', daemon=True)
+        self._receiver.start()
+
+    @property
+    def load(self) -> float:
+        return len(self.pending) / self.capacity
+
+    def send(self, task_id: int, message: tuple, future: concurrent.futures.Future):
+        with self._lock:
+            if self.closed:
+                future.set_exception(ConnectionError('lost the worker at ' + str(self.address)))
+                return
+            self.pending[task_id] = future
+
+        try:
+            with self._send_lock:
+                self._connection.send(message)
+        except Exception as exc:
+            with self._lock:
+                self.pending.pop(task_id, None)
+            future.set_exception(exc if isinstance(exc, OSError) else
+                                 TypeError('arguments not picklable: ' + repr(exc)))
+
+    def receive(self):
+        try:
+            while True:
+                kind, task_id, payload, execution = self._connection.recv()
+                with self._lock:
+                    future = self.pending.pop(task_id, None)
+                if future is None:
+                    continue
+                if execution is not None:
+                    # The clock of the worker is not compared, the run is taken to end as its output arrives
+                    end = time.perf_counter()
+                    future.execution[:] = [self.name + ' ' + execution[0], end - execution[1], end]
+                try:
+                    if kind == 'result':
+                        future.set_result(payload)
+                    else:
+                        future.set_exception(payload)
+                except concurrent.futures.InvalidStateError:
+                    # Cancelled, the output is discarded
+                    pass
+        except (EOFError, OSError):
+            pass
+        finally:
+            # Whatever stopped the receiver, the tasks left would never complete
+            with self._lock:
+                self.closed = True
+                pending, self.pending = self.pending, {}
+            for future in pending.values():
+                try:
+                    future.set_exception(ConnectionError('lost the worker at ' + str(self.address)))
+                except concurrent.futures.InvalidStateError:
+                    pass
+
+    def close(self):
+        self._connection.close()
+
+
+class RemoteBackend:
+
+    def __init__(self, addresses: list, authkey: bytes = None, retry_interval: float = 5.):
+        """
+        A RemoteBackend sends the script functions to worker daemons. The workers are connected on the first
+        submission, and again after a connection has been lost.
+
+        :param addresses: (host, port) of the workers
+        :param authkey: key shared with the workers, default_authkey() by default
+        :param retry_interval: time between two connection attempts to a worker unreachable or lost, in seconds
+        """
+        self.addresses = list(addresses)
+        self.authkey = authkey or default_authkey()
+        self.retry_interval = retry_interval
+
+        self._workers = {}
+        # Time of the last failed connection attempt to each address
+        self._failures = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return sum(worker.capacity for worker in self.workers())
+
+    def workers(self) -> list:
+        """
+        Return the connected workers. The workers not connected yet, or whose connection has been lost, are connected
+        again, at most once per retry_interval.
+
+        :return: list of RemoteWorker
+        """
+        with self._lock:
+            now = time.monotonic()
+            for address in self.addresses:
+                worker = self._workers.get(address)
+                if worker is not None and not worker.closed:
+                    continue
+                if now - self._failures.get(address, -float('inf')) < self.retry_interval:
+                    continue
+                try:
+                    self._workers[address] = RemoteWorker(address, self.authkey)
+                    self._failures.pop(address, None)
+                except ConnectionError as exc:
+                    print(exc, file=sys.stderr)
+                    self._workers.pop(address, None)
+                    self._failures[address] = now
+            return [worker for worker in self._workers.values() if not worker.closed]
+
+    def send(self, message, *content) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        future.execution = []
+
+        workers = [worker for worker in self.workers() if not worker.closed]
+        if not workers:
+            future.set_exception(ConnectionError('no remote worker reachable among ' + str(self.addresses)))
+            return future
+
+        task_id = next(self._ids)
+        min(workers, key=lambda worker: worker.load).send(task_id, (message, task_id) + content, future)
+
+        return future
+
+    def submit(self, script_file: str, script_function: str, args: list,
+               kwargs: dict = None) -> concurrent.futures.Future:
+        """
+        Run a script function on the least loaded worker
+
+        :param script_file: path of the script file containing the script_function, relative to the repository root
+        :param script_function: function in script_file to be executed
+        :param args: arguments of the function, they have to be picklable
+        :param kwargs: keyword arguments of the function, they have to be picklable
+        :return: future of the function output, cancelling it discards the output when it arrives
+        """
+        return self.send('task', script_file, script_function, args, kwargs)
+
+    def submit_chain(self, steps: tuple, args: list) -> concurrent.futures.Future:
+        """
+        Run the functions of a chain of blocks on the least loaded worker, as a single task
+
+        :param steps: steps of the chain, see fusion.run_chain
+        :param args: arguments of the first function
+        :return: future of the outputs of the functions, of the exception that stopped the chain and of the execution
+        times of the functions
+        """
+        return self.send('chain', steps, args)
+
+    def shutdown(self):
+        with self._lock:
+            for worker in self._workers.values():
+                worker.close()
+            self._workers = {}
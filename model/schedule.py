@@ -0,0 +1,112 @@
+"""
+schedule.py ranks the ready blocks when more blocks are ready than there are workers. A block is ranked by its
+critical path: the longest chain of execution times from the block down to the end of the prairie. Starting the block
+with the longest critical path first keeps the workers busy until the end of the run.
+
+The execution times are those measured at the previous runs, recorded per function in a DurationHistory and
+optionally kept in a JSON file from one session to the other.
+
+Examples :
+
+    input ---- wait(1s) ---- output              wait is started first: its critical path is 1s long,
+          \\
+           --- add ---- sinus ---- output        against a few microseconds for add
+"""
+
+import json
+import os
+import threading
+
+
+class DurationHistory:
+
+    def __init__(self, filename: str = None, smoothing: float = 0.5):
+        """
+        A DurationHistory records the execution time of each script function, as an exponential moving average over
+        the runs
+
+        :param filename: JSON file in which the durations are kept across sessions, None to keep them in memory
+        :param smoothing: weight of the last duration measured in the average
+        """
+        self.filename = filename
+        self.smoothing = smoothing
+
+        self._durations = {}
+        self._lock = threading.Lock()
+
+        if filename is not None and os.path.isfile(filename):
+            try:
+                with open(filename, 'r') as file:
+                    self._durations = {key: float(duration) for key, duration in json.load(file).items()}
+            except (OSError, ValueError, AttributeError):
+                self._durations = {}
+
+    def __len__(self):
+        return len(self._durations)
+
+    @staticmethod
+    def key(block) -> str:
+        return os.path.abspath(block.thread.script_file) + ':' + block.thread.script_function
+
+    def record(self, block, duration: float):
+        """
+        Record an execution time of the function of a block
+
+        :param block: Block executed
+        :param duration: execution time, in seconds
+        """
+        key = self.key(block)
+        with self._lock:
+            previous = self._durations.get(key)
+            if previous is None:
+                self._durations[key] = duration
+            else:
+                self._durations[key] = self.smoothing * duration + (1 - self.smoothing) * previous
+
+    def estimate(self, block, default: float = 1e-3) -> float:
+        """
+        Return the expected execution time of the function of a block
+
+        :param block: Block
+        :param default: duration returned for a function never measured, in seconds
+        :return: duration in seconds
+        """
+        return self._durations.get(self.key(block), default)
+
+    def mean(self, default: float = 1e-3) -> float:
+        """
+        Return the mean of the durations recorded, given to the functions never measured
+
+        :param default: duration returned if no function has been measured, in seconds
+        :return: duration in seconds
+        """
+        with self._lock:
+            durations = list(self._durations.values())
+        return sum(durations) / len(durations) if durations else default
+
+    def save(self):
+        if self.filename is None:
+            return
+        with self._lock:
+            durations = dict(self._durations)
+        with open(self.filename, 'w') as file:
+            json.dump(durations, file, indent=2, sort_keys=True)
+
+
+def critical_path(plan, history: DurationHistory) -> list:
+    """
+    Return the critical path of each block of a plan: its expected execution time plus the longest critical path of
+    its consumers
+
+    :param plan: ExecutionPlan
+    :param history: DurationHistory of the functions
+    :return: list of durations in seconds, indexed by block position
+    """
+    default = history.mean()
+
+    ranks = [0.] * len(plan.blocks)
+    for position in reversed(range(len(plan.blocks))):
+        ranks[position] = history.estimate(plan.blocks[position], default) + \
+            max((ranks[consumer] for consumer in plan.consumers[position]), default=0.)
+
+    return ranks
@@ -0,0 +1,180 @@
+"""
+serializer.py reads and writes the prairie part of the .yml files, using the model objects only so that prairies can be
+loaded without the GUI.
+
+A prairie file contains:
+- prairie: blocks, connections and nodes of the Prairie, as described by describe_prairie
+- prairie_view: position of each block in the PrairieView
+"""
+
+from model.blocks import *
+from model.core import *
+import yaml
+
+
+def describe_block(block: Block, mode='debug') -> dict:
+
+    if mode == 'debug':
+
+        block_dict = {'name': block.name,
+                      'type': block.type,
+                      'nodes': {'in': {node.name: node.id for node in list(block.nodes_in().values())},
+                                'out': {node.name: node.id for node in list(block.nodes_out().values())}},
+                      'id': str(block.id)}
+    else:
+
+        block_dict = {'name': block.name,
+                      'type': block.type,
+                      'nodes': {'in': {node.id: node.id for node in list(block.nodes_in().values())},
+                                'out': {node.id: node.id for node in list(block.nodes_out().values())}},
+                      'id': str(block.id)}
+
+    if isinstance(block, InputBlock):
+        block_dict['value'] = block.nodes_in()['x'].value
+        if block.sweep:
+            block_dict['sweep'] = True
+    elif isinstance(block, CompositeBlock):
+        block_dict['prairie_file'] = block.thread.script_file
+    elif isinstance(block, FunctionBlock):
+        block_dict['script_function'] = block.thread.script_function
+        block_dict['script_file'] = block.thread.script_file
+
+    if block.thread.backend is not None:
+        block_dict['backend'] = block.thread.backend
+    if block.thread.timeout is not None:
+        block_dict['timeout'] = block.thread.timeout
+
+    return block_dict
+
+
+def describe_prairie_blocks(prairie: Prairie, mode='debug') -> dict:
+    blocks = prairie.blocks_id()
+    return {block_id: describe_block(blocks[block_id], mode=mode) for block_id in blocks}
+
+
+def describe_prairie_nodes(prairie: Prairie) -> dict:
+    nodes_dict = {}
+    blocks_dict = describe_prairie_blocks(prairie, mode='debug')
+
+    for block_id, block_dict in blocks_dict.items():
+        block_nodes_dict = block_dict['nodes']
+        for node_name, node_id in block_nodes_dict['in'].items():
+            nodes_dict[node_id] = {'block_id': block_id, 'node_name': node_name, 'node_type': 'in'}
+        for node_name, node_id in block_nodes_dict['out'].items():
+            nodes_dict[node_id] = {'block_id': block_id, 'node_name': node_name, 'node_type': 'out'}
+
+    return nodes_dict
+
+
+def describe_prairie(prairie: Prairie) -> dict:
+    connections = prairie.connections_id()
+    nodes = describe_prairie_nodes(prairie)
+
+    blocks_dict = describe_prairie_blocks(prairie, mode='dev')
+
+    connections_dict = {connection.id: [connection.block_in().id, connection.node_in.id,
+                        connection.block_out().id, connection.node_out.id]
+                        for connection in list(connections.values())}
+
+    return {'blocks': blocks_dict, 'connections': connections_dict, 'nodes': nodes, 'backend': prairie.backend}
+
+
+def create_block_from_dict(block_dict: dict) -> Block:
+
+    block_type = block_dict['type']
+
+    if block_type == 'input':
+        block = InputBlock(block_dict['name'], str(block_dict['value']))
+        block.sweep = block_dict.get('sweep', False)
+    elif block_type == 'function':
+        block = FunctionBlock(block_dict['script_file'], block_dict['script_function'])
+    elif block_type == 'composite':
+        block = CompositeBlock(block_dict['prairie_file'])
+    elif block_type == 'output':
+        block = OutputBlock(block_dict['name'])
+    elif block_type == 'chart':
+        block = ChartBlock(block_dict['name'])
+    else:
+        block = None
+
+    try:
+        block.id = block_dict['id']
+    except KeyError:
+        pass
+
+    block.thread.backend = block_dict.get('backend')
+    block.thread.timeout = block_dict.get('timeout')
+
+    return block
+
+
+def reassign_nodes(prairie: Prairie, nodes: dict):
+    """
+    Give back to the nodes of a loaded prairie the ids they had when the prairie was saved
+
+    :param prairie: loaded prairie
+    :param nodes: nodes part of the prairie file
+    """
+    prairie_blocks = prairie.blocks_id()
+
+    for node_id, node_dict in nodes.items():
+        if node_dict['node_type'] == 'in':
+            prairie_blocks[node_dict['block_id']].nodes_in()[node_dict['node_name']].id = node_id
+        if node_dict['node_type'] == 'out':
+            prairie_blocks[node_dict['block_id']].nodes_out()[node_dict['node_name']].id = node_id
+
+
+def read_file(filename: str) -> dict:
+
+    import_dict = {}
+
+    with open(filename, 'r') as stream:
+        try:
+            import_dict = yaml.load(stream, Loader=yaml.FullLoader)
+        except yaml.YAMLError as exc:
+            print(exc)
+
+    return import_dict
+
+
+def save_prairie(prairie: Prairie, filename: str):
+    """
+    Write a prairie file without its view, readable by load_prairie
+
+    :param prairie: Prairie to save
+    :param filename: path of the .yml prairie file
+    """
+    with open(filename, 'w') as outfile:
+        yaml.dump({'prairie': describe_prairie(prairie)}, outfile, default_flow_style=False)
+
+
+def load_prairie(filename: str) -> Prairie:
+    """
+    Load a prairie file into a new Prairie, without its view
+
+    :param filename: path of the .yml prairie file
+    :return: Prairie
+    """
+    import_dict = read_file(filename)
+
+    prairie = Prairie()
+    prairie.backend = import_dict['prairie'].get('backend', 'thread')
+
+    for block_dict in import_dict['prairie']['blocks'].values():
+        prairie.add_block(create_block_from_dict(block_dict))
+
+    reassign_nodes(prairie, import_dict['prairie']['nodes'])
+
+    blocks = prairie.blocks_id()
+    for connection_id, connection in import_dict['prairie']['connections'].items():
+        block_in_id, node_in_id, block_out_id, node_out_id = connection
+
+        connection = prairie.connect_nodes(blocks[block_in_id].node_by_id(node_in_id),
+                                           blocks[block_out_id].node_by_id(node_out_id))
+
+        if connection:
+            connection.id = connection_id
+        else:
+            print('error')
+
+    return prairie
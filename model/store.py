@@ -0,0 +1,180 @@
+"""
+store.py keeps the large numpy arrays of the node values out of the process heap. When a prairie has a ValueStore,
+setting a node to a large array copies it to a file of the shared memory (/dev/shm) and the node only holds a
+StoredArray handle. Reading the node returns a memory map of that file, an ndarray that never has to be copied again
+when it is transferred from node to node.
+
+When the arrays in shared memory exceed the memory budget of the store, the least recently read arrays are moved to
+files on the local disk: they are still read as memory maps, the operating system paging them in when they are used.
+
+A stored array is removed as soon as no node holds it anymore.
+"""
+
+from collections import OrderedDict
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+
+import numpy as np
+
+_SHARED_MEMORY = '/dev/shm'
+
+
+class StoredArray:
+
+    __slots__ = ('store', 'key', '__weakref__')
+
+    def __init__(self, store, key: int):
+        """
+        A StoredArray is the handle held by a node in place of an array of the ValueStore
+
+        :param store: ValueStore containing the array
+        :param key: key of the array in the store
+        """
+        self.store = store
+        self.key = key
+
+    @property
+    def array(self) -> np.ndarray:
+        return self.store.get(self)
+
+
+class ValueStore:
+
+    def __init__(self, memory_bytes: int = 1024 ** 3, threshold: int = 1024 ** 2, directory: str = None):
+        """
+        A ValueStore places the large arrays of the node values in shared memory, spilling the least recently used
+        ones to memory-mapped files on disk past its memory budget
+
+        :param memory_bytes: size of the arrays kept in shared memory, in bytes
+        :param threshold: size from which an array is stored, in bytes, smaller values stay in the nodes
+        :param directory: directory of the spilled arrays, the temporary directory by default
+        """
+        self.memory_bytes = memory_bytes
+        self.threshold = threshold
+
+        self.bytes = 0
+        self.spilled_bytes = 0
+
+        memory_directory = _SHARED_MEMORY if os.path.isdir(_SHARED_MEMORY) else None
+        self.memory_directory = tempfile.mkdtemp(prefix='prairie-store-', dir=memory_directory)
+        self.directory = tempfile.mkdtemp(prefix='prairie-spill-', dir=directory)
+
+        # key: [path, array, in memory], in order of last use
+        self._entries = OrderedDict()
+        self._handles = weakref.WeakValueDictionary()
+        self._keys = itertools.count()
+        self._lock = threading.Lock()
+
+        self._finalizer = weakref.finalize(self, _remove_directories, self.memory_directory, self.directory)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def accepts(self, value) -> bool:
+        """
+        Return weather a value is stored rather than held by its node
+
+        :param value: value of a node
+        :return: boolean
+        """
+        return isinstance(value, np.ndarray) and not value.dtype.hasobject and value.nbytes >= self.threshold
+
+    def put(self, array: np.ndarray) -> StoredArray:
+        """
+        Store an array, an array read from the store being stored once
+
+        :param array: numpy array
+        :return: handle of the stored array
+        """
+        handle = self._handles.get(id(array))
+        if handle is not None and self._entries.get(handle.key, [None, None])[1] is array:
+            return handle
+
+        key = next(self._keys)
+        path = os.path.join(self.memory_directory, str(key) + '.dat')
+
+        stored = np.memmap(path, dtype=array.dtype, mode='w+', shape=array.shape)
+        stored[...] = array
+
+        handle = StoredArray(self, key)
+        with self._lock:
+            self._entries[key] = [path, stored, True]
+            self._handles[id(stored)] = handle
+            self.bytes += stored.nbytes
+            self.spill()
+
+        weakref.finalize(handle, self.remove, key)
+
+        return handle
+
+    def get(self, handle: StoredArray) -> np.ndarray:
+        """
+        Return a stored array and mark it as recently used
+
+        :param handle: handle returned by put
+        :return: memory map of the array
+        """
+        with self._lock:
+            entry = self._entries[handle.key]
+            self._entries.move_to_end(handle.key)
+        return entry[1]
+
+    def spill(self):
+        """
+        Move the least recently used arrays from shared memory to disk until the memory budget is met
+        """
+        for key, entry in list(self._entries.items()):
+            if self.bytes <= self.memory_bytes:
+                break
+            if not entry[2]:
+                continue
+
+            path, array, _ = entry
+            spilled_path = os.path.join(self.directory, os.path.basename(path))
+            shutil.copyfile(path, spilled_path)
+            os.remove(path)
+
+            # The arrays already read keep the shared memory mapping until they are released
+            spilled = np.memmap(spilled_path, dtype=array.dtype, mode='r+', shape=array.shape)
+            self._entries[key] = [spilled_path, spilled, False]
+            handle = self._handles.pop(id(array), None)
+            if handle is not None:
+                self._handles[id(spilled)] = handle
+
+            self.bytes -= array.nbytes
+            self.spilled_bytes += array.nbytes
+
+    def remove(self, key: int):
+        with self._lock:
+            if key not in self._entries:
+                return
+            path, array, in_memory = self._entries.pop(key)
+            self._handles.pop(id(array), None)
+            if in_memory:
+                self.bytes -= array.nbytes
+            else:
+                self.spilled_bytes -= array.nbytes
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def close(self):
+        """
+        Remove all the stored arrays, the memory maps already read stay valid
+        """
+        with self._lock:
+            self._entries.clear()
+            self._handles.clear()
+            self.bytes = 0
+            self.spilled_bytes = 0
+        self._finalizer()
+
+
+def _remove_directories(*directories):
+    for directory in directories:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,253 @@
+"""
+stream.py runs blocks chunk by chunk, so that a large signal never has to be held whole in a node:
+- a generator script function is a stream source, each yielded chunk is sent downstream as soon as it is produced
+- a block receiving a stream is applied to each chunk, its outputs being streams as well
+- output and chart blocks concatenate the chunks they receive, they end the stream
+
+Each connection leaving a streaming node has its own bounded queue. A producer blocks when one of its consumers is
+late, so that the memory used by a stream depends on the size of its chunks and not on the size of the data. The
+stages of a stream run at the same time, each one on its own thread: a stage waiting for chunks never holds a worker
+of the backends.
+
+Example of stream source, its chunks being consumed by the blocks connected to its output node 'chunk':
+
+    def chunks(n):
+        for i in range(n):
+            chunk = np.random.rand(1000)
+            yield chunk
+"""
+
+import concurrent.futures
+import queue
+import threading
+
+import numpy as np
+
+from model.compiler import load_function
+
+_END = object()
+
+
+class StreamError(Exception):
+    pass
+
+
+class Stream:
+
+    def __init__(self, readers: int, maxsize: int = 4):
+        """
+        A Stream is the value of a streaming output node. Every chunk put in the stream is sent to each of its readers,
+        through one bounded queue per reader.
+
+        :param readers: number of readers of the stream, one per connection of the node
+        :param maxsize: number of chunks a queue holds before the producer waits for its reader
+        """
+        self.error = None
+
+        self._queues = [queue.Queue(maxsize) for _ in range(readers)]
+        self._closed = [False] * readers
+        self._claimed = 0
+        self._aborted = False
+        self._lock = threading.Lock()
+
+    def reader(self):
+        """
+        Claim the next queue of the stream
+
+        :return: StreamReader
+        """
+        with self._lock:
+            if self._claimed >= len(self._queues):
+                raise StreamError('stream already read by all its connections')
+            self._claimed += 1
+            return StreamReader(self, self._claimed - 1)
+
+    def put(self, chunk):
+        """
+        Send a chunk to every reader still reading, waiting for the readers whose queue is full
+
+        :param chunk: chunk of data
+        """
+        for index, chunk_queue in enumerate(self._queues):
+            if not (self._aborted or self._closed[index]):
+                chunk_queue.put(chunk)
+
+    def end(self, error: Exception = None):
+        """
+        Tell the readers that no chunk follows
+
+        :param error: exception raised by the producer, raised again by the readers
+        """
+        self.error = error
+        self.put(_END)
+
+    def abort(self):
+        """
+        Stop the stream from another thread: the producer stops sending chunks and the readers raise a StreamError
+        """
+        self.error = StreamError('stream aborted')
+        self._aborted = True
+        for index in range(len(self._queues)):
+            while not self._closed[index]:
+                self.discard(index)
+                try:
+                    self._queues[index].put_nowait(_END)
+                    break
+                except queue.Full:
+                    # The producer put a chunk before seeing the stream aborted
+                    continue
+
+    def close(self, index: int):
+        """
+        Stop sending chunks to a reader
+
+        :param index: index of the reader queue
+        """
+        self._closed[index] = True
+        self.discard(index)
+
+    def discard(self, index: int):
+        # Emptying the queue wakes up a producer waiting for room in it
+        try:
+            while True:
+                self._queues[index].get_nowait()
+        except queue.Empty:
+            pass
+
+
+class StreamReader:
+
+    def __init__(self, stream: Stream, index: int):
+        """
+        A StreamReader iterates over the chunks of a stream, it is the argument given to the script functions in place
+        of the stream
+
+        :param stream: Stream read
+        :param index: index of the queue of the reader in the stream
+        """
+        self.stream = stream
+        self.index = index
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = self.stream._queues[self.index].get()
+        if chunk is _END:
+            if self.stream.error is not None:
+                raise StreamError('upstream stream failed') from self.stream.error
+            raise StopIteration
+        return chunk
+
+    def close(self):
+        self.stream.close(self.index)
+
+
+def chunk_arguments(args: list):
+    """
+    Iterate over the arguments of a function applied chunk by chunk, the streams being read in lockstep and the other
+    arguments being given whole to every call
+
+    :param args: arguments, StreamReaders for the streaming ones
+    :return: iterator of argument lists
+    """
+    streaming = [i for i, arg in enumerate(args) if isinstance(arg, StreamReader)]
+
+    while True:
+        chunks = [next(args[i], _END) for i in streaming]
+
+        if all(chunk is _END for chunk in chunks):
+            return
+        if any(chunk is _END for chunk in chunks):
+            raise StreamError('streams of different lengths')
+
+        chunk_args = list(args)
+        for i, chunk in zip(streaming, chunks):
+            chunk_args[i] = chunk
+        yield chunk_args
+
+
+def concatenate(chunks: list):
+    """
+    Join the chunks of a stream into one value
+
+    :param chunks: list of chunks
+    :return: numpy array
+    """
+    try:
+        return np.concatenate(chunks)
+    except ValueError:
+        # Chunks of scalars
+        return np.asarray(chunks)
+
+
+def run_stage(backend, script_file: str, script_function: str, args: list, outputs: list, generator: bool):
+    """
+    Run a block over streams, on the calling thread
+
+    :param backend: backend of the block, running each call of a non generator function
+    :param script_file: path of the script file containing the script_function
+    :param script_function: function in script_file to be executed
+    :param args: arguments of the function, StreamReaders for the streaming ones
+    :param outputs: Streams of the output nodes of the block, None to return the concatenated chunks instead
+    :param generator: weather the function is a generator, receiving the StreamReaders themselves
+    :return: output of the function when outputs is None
+    """
+    try:
+        if generator:
+            chunks = load_function(script_file, script_function)(*args)
+        else:
+            chunks = (backend.submit(script_file, script_function, chunk_args).result()
+                      for chunk_args in chunk_arguments(args))
+
+        if outputs is None:
+            chunks = list(chunks)
+            if chunks and isinstance(chunks[0], tuple):
+                return tuple(concatenate([chunk[i] for chunk in chunks]) for i in range(len(chunks[0])))
+            return concatenate(chunks)
+
+        for chunk in chunks:
+            if len(outputs) == 1:
+                outputs[0].put(chunk)
+            else:
+                for stream, value in zip(outputs, chunk):
+                    stream.put(value)
+
+    except Exception as exc:
+        for stream in outputs or []:
+            stream.end(exc)
+        raise
+
+    else:
+        for stream in outputs or []:
+            stream.end()
+
+    finally:
+        for arg in args:
+            if isinstance(arg, StreamReader):
+                arg.close()
+
+
+def start_stage(name: str, *stage_args) -> concurrent.futures.Future:
+    """
+    Run run_stage on a new thread
+
+    :param name: name of the block, given to the thread
+    :param stage_args: arguments of run_stage
+    :return: future of the result of run_stage
+    """
+    future = concurrent.futures.Future()
+
+    def target():
+        try:
+            output = run_stage(*stage_args)
+        except Exception as exc:
+            if not future.cancelled():
+                future.set_exception(exc)
+        else:
+            if not future.cancelled():
+                future.set_result(output)
+
+    threading.Thread(target=target, name='prairie-stream-' + name, daemon=True).start()
+
+    return future
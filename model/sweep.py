@@ -0,0 +1,123 @@
+"""
+sweep.py runs blocks over a batch of values, when an input block is in sweep mode: the value of the input block is then
+a list or an array of values, and every block downstream of it receives batches instead of single values.
+
+- a vectorizable function receives each batch as one numpy array, the first axis running over the batch
+- any other function is called once per element of the batch, the calls being fanned out to the block backend
+
+The outputs are stacked along a new first axis, so a sweep of N values is a single batched run of the prairie.
+
+Script functions are marked as vectorizable by an attribute set after their definition, so that scripts do not
+depend on the model and import anywhere, on remote workers too:
+
+    def add(x, y):
+        return x+y
+
+
+    add.vectorizable = True
+"""
+
+import concurrent.futures
+import threading
+
+import numpy as np
+
+
+def stack(values: list):
+    """
+    Stack the values computed for each element of a batch
+
+    :param values: list of values
+    :return: numpy array stacked along a new first axis, or the list if the values cannot be stacked
+    """
+    try:
+        return np.stack(values)
+    except (ValueError, TypeError):
+        return values
+
+
+def stack_outputs(outputs: list):
+    """
+    Stack the outputs computed for each element of a batch, output by output for functions returning tuples
+
+    :param outputs: list of function outputs
+    :return: stacked output
+    """
+    if outputs and isinstance(outputs[0], tuple):
+        return tuple(stack([output[i] for output in outputs]) for i in range(len(outputs[0])))
+    return stack(outputs)
+
+
+def gather(futures: list, combine) -> concurrent.futures.Future:
+    """
+    Return a future of the combination of the results of several futures
+
+    :param futures: list of futures
+    :param combine: function called with the list of results
+    :return: future of the combined result
+    """
+    future = concurrent.futures.Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def finish():
+        if future.cancelled():
+            return
+        try:
+            result = combine([done.result() for done in futures])
+        except Exception as exc:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            finish()
+
+    if not futures:
+        finish()
+    for pending in futures:
+        pending.add_done_callback(done)
+
+    return future
+
+
+def batch_size(args: list, batched: list) -> int:
+    sizes = {len(arg) for arg, is_batched in zip(args, batched) if is_batched}
+    if len(sizes) > 1:
+        raise ValueError('swept inputs have different sizes ' + str(sorted(sizes)))
+    return sizes.pop()
+
+
+def submit_batch(backend, script_file: str, script_function: str, args: list, batched: list,
+                 vectorized: bool) -> concurrent.futures.Future:
+    """
+    Run a script function over batched arguments
+
+    :param backend: backend of the block
+    :param script_file: path of the script file containing the script_function
+    :param script_function: function in script_file to be executed
+    :param args: arguments of the function, the batched ones being sequences of values
+    :param batched: for each argument, weather it is batched
+    :param vectorized: weather the function processes whole batches
+    :return: future of the stacked output
+    """
+    if vectorized:
+        batch_size(args, batched)
+        args = [np.asarray(arg) if is_batched else arg for arg, is_batched in zip(args, batched)]
+        # The batch axis goes in front of the axes of every argument, so that it never broadcasts against the axes of
+        # an unbatched array: x of shape (N,) and y of shape (M,) give (N, M), as calling the function per element
+        ndim = max([np.ndim(arg) for arg, is_batched in zip(args, batched) if not is_batched] +
+                   [arg.ndim - 1 for arg, is_batched in zip(args, batched) if is_batched])
+        args = [arg.reshape(arg.shape[:1] + (1,) * (ndim - arg.ndim + 1) + arg.shape[1:]) if is_batched else arg
+                for arg, is_batched in zip(args, batched)]
+        return backend.submit(script_file, script_function, args)
+
+    futures = [backend.submit(script_file, script_function,
+                              [arg[i] if is_batched else arg for arg, is_batched in zip(args, batched)])
+               for i in range(batch_size(args, batched))]
+
+    return gather(futures, stack_outputs)
@@ -0,0 +1,149 @@
+"""
+trace.py records the events of the runs of an Engine and writes them in the Chrome trace event format, to be opened
+in chrome://tracing or https://ui.perfetto.dev:
+
+    trace = Trace()
+    trace.attach(engine)
+    engine.run()
+    trace.save('run.json')
+
+Each block execution is a slice on the lane of the thread, process or remote worker that ran it, from the start to the
+end of its function as measured by the backend, so that the blocks of a fused chain follow each other on one lane. The
+runs not measured, on the asyncio backend, stream stages or sweeps fanned out over several workers, are slices from
+their submission to their completion on lanes allocated as the blocks run: such a lane is a slot of the engine, an
+idle lane an idle slot. The blocks becoming ready and the values transferred between blocks are instants on the lane
+of the dispatcher.
+"""
+
+import json
+import os
+import threading
+import time
+
+from model.cache import size_of
+
+_DISPATCHER = 0
+
+
+class Trace:
+
+    def __init__(self):
+        """
+        A Trace records the events emitted by an Engine, with their time stamp, worker lane and payload size
+        """
+        self.events = []
+
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._running = {}
+        self._executions = {}
+        self._lanes = []
+        # Thread id of each lane name, in the order the lanes appeared
+        self._tids = {'dispatcher': _DISPATCHER}
+        self._lock = threading.Lock()
+
+    def attach(self, engine):
+        """
+        Record the events of an engine
+
+        :param engine: Engine
+        """
+        engine.connect('queued', self.queued)
+        engine.connect('started', self.started)
+        engine.connect('executed', self.executed)
+        engine.connect('done', self.done)
+        engine.connect('failed', self.failed)
+        engine.connect('cancelled', self.cancelled)
+        engine.connect('transferred', self.transferred)
+
+    def timestamp(self, counter: float = None) -> float:
+        # Microseconds since the creation of the trace, of a time.perf_counter value or of now
+        return ((time.perf_counter() if counter is None else counter) - self._origin) * 1e6
+
+    def tid(self, lane: str) -> int:
+        return self._tids.setdefault(lane, len(self._tids))
+
+    def instant(self, name: str, category: str, args: dict):
+        with self._lock:
+            self.events.append({'name': name, 'cat': category, 'ph': 'i', 's': 't', 'ts': self.timestamp(),
+                                'pid': self._pid, 'tid': _DISPATCHER, 'args': args})
+
+    def queued(self, block):
+        self.instant(block.name, 'queued', {'block': block.id})
+
+    def started(self, block):
+        with self._lock:
+            if None in self._lanes:
+                lane = self._lanes.index(None)
+                self._lanes[lane] = block
+            else:
+                lane = len(self._lanes)
+                self._lanes.append(block)
+            self._running[block] = (self.timestamp(), lane)
+
+    def executed(self, block, worker: str, start: float, end: float):
+        with self._lock:
+            self._executions[block] = (worker, self.timestamp(start), self.timestamp(end))
+
+    def finished(self, block, status: str, args: dict):
+        with self._lock:
+            try:
+                start, lane = self._running.pop(block)
+            except KeyError:
+                # Output set without running, by Engine.warm_start
+                start, lane = self.timestamp(), None
+            if lane is not None:
+                self._lanes[lane] = None
+
+            execution = self._executions.pop(block, None)
+            if execution is not None:
+                worker, start, end = execution
+                tid = self.tid(worker)
+            else:
+                end = self.timestamp()
+                tid = _DISPATCHER if lane is None else self.tid('slot ' + str(lane))
+
+            args.update({'block': block.id, 'backend': block.execution_backend(), 'status': status})
+            self.events.append({'name': block.name, 'cat': status, 'ph': 'X', 'ts': start, 'dur': end - start,
+                                'pid': self._pid, 'tid': tid, 'args': args})
+
+    def done(self, block, output: list):
+        self.finished(block, 'finished', {'bytes': size_of(output)})
+
+    def failed(self, block, exception: Exception):
+        self.finished(block, 'failed', {'exception': repr(exception)})
+
+    def cancelled(self, block):
+        self.finished(block, 'cancelled', {})
+
+    def transferred(self, connection):
+        self.instant(connection.block_in().name + ' -> ' + connection.block_out().name, 'transferred',
+                     {'connection': connection.id, 'bytes': size_of(connection.node_in.value)})
+
+    def clear(self):
+        with self._lock:
+            self.events = []
+            self._running = {}
+            self._executions = {}
+            self._lanes = []
+            self._tids = {'dispatcher': _DISPATCHER}
+            self._origin = time.perf_counter()
+
+    def to_dict(self) -> dict:
+        """
+        Return the trace in the Chrome trace event format
+
+        :return: dictionary serializable to JSON
+        """
+        with self._lock:
+            tids = dict(self._tids)
+            events = list(self.events)
+
+        names = [{'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid, 'args': {'name': lane}}
+                 for lane, tid in tids.items()]
+
+        return {'traceEvents': names + events, 'displayTimeUnit': 'ms'}
+
+    def save(self, filename: str):
+        with open(filename, 'w') as file:
+            json.dump(self.to_dict(), file)
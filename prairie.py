@@ -0,0 +1,281 @@
+"""
+Command line runner of saved prairies, without the GUI:
+
+    python -m prairie run files/prairies/the_long_example.yml --set input=10 --json outputs.json
+
+Blocks on the 'remote' backend run on worker daemons, the key shared with them being the PRAIRIE_AUTHKEY variable:
+
+    python -m prairie worker --port 7450 --workers 4
+    python -m prairie run files/prairies/the_long_example.yml --backend remote --remote localhost:7450 --workers 4
+
+A run recorded with --checkpoint DIRECTORY is resumed from the blocks that failed with:
+
+    python -m prairie resume DIRECTORY
+
+The values of the output and chart blocks are written as JSON, keyed by block id.
+"""
+
+import argparse
+import json
+import sys
+
+from model.blocks import InputBlock
+from model.cache import DiskCache, ResultCache
+from model.checkpoint import Checkpoint
+from model.engine import Engine
+from model.remote import DEFAULT_PORT, parse_address, serve
+from model.schedule import DurationHistory
+from model.serializer import load_prairie
+from model.store import ValueStore
+from model.trace import Trace
+
+
+def to_json(value):
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    elif isinstance(value, complex):
+        return [value.real, value.imag]
+    return str(value)
+
+
+def set_inputs(prairie, assignments: list, sweep: bool = False):
+    """
+    Set the value of input blocks from NAME=VALUE assignments, NAME being the name or the id of the blocks
+
+    :param prairie: Prairie containing the input blocks
+    :param assignments: list of 'NAME=VALUE' strings
+    :param sweep: put the input blocks in sweep mode, VALUE being the list or array of values swept
+    """
+    for assignment in assignments:
+        name, _, value = assignment.partition('=')
+        blocks = [block for block in prairie.blocks_id().values()
+                  if isinstance(block, InputBlock) and name in (block.name, block.id)]
+        if not blocks:
+            raise SystemExit('no input block named ' + name)
+        for block in blocks:
+            block.nodes_in()['x'].set_value(value)
+            block.sweep = sweep
+            prairie.mark_dirty(block)
+
+
+def find_targets(prairie, names: list) -> list:
+    """
+    Return the blocks named by the --target options
+
+    :param prairie: Prairie containing the blocks
+    :param names: names or ids of the blocks
+    :return: list of blocks, None if no target is given
+    """
+    if not names:
+        return None
+
+    targets = []
+    for name in names:
+        blocks = [block for block in prairie.blocks_id().values() if name in (block.name, str(block.id))]
+        if not blocks:
+            raise SystemExit('no block named ' + name)
+        targets += blocks
+
+    return targets
+
+
+def pin_nodes(prairie, names: list):
+    """
+    Pin the output nodes named by the --pin options, so that --free-values keeps their values
+
+    :param prairie: Prairie containing the blocks
+    :param names: names or ids of blocks, pinning all their output nodes, or BLOCK.NODE to pin a single output node
+    """
+    for name in names:
+        block_name, _, node_name = name.partition('.')
+        blocks = [block for block in prairie.blocks_id().values() if block_name in (block.name, str(block.id))]
+        if not blocks:
+            raise SystemExit('no block named ' + block_name)
+        for block in blocks:
+            nodes = block.nodes_out()
+            if node_name and node_name not in nodes:
+                raise SystemExit(block_name + ' has no output node named ' + node_name)
+            for node in [nodes[node_name]] if node_name else nodes.values():
+                node.pinned = True
+
+
+def run(arguments) -> int:
+    prairie = load_prairie(arguments.file)
+    set_inputs(prairie, arguments.set)
+    set_inputs(prairie, arguments.sweep, sweep=True)
+
+    checkpoint = None
+    if arguments.checkpoint is not None:
+        checkpoint = Checkpoint(arguments.checkpoint)
+        checkpoint.save_prairie(prairie)
+        checkpoint.failed.clear()
+        checkpoint.save_failed()
+
+    return execute(prairie, arguments, checkpoint)
+
+
+def resume(arguments) -> int:
+    checkpoint = Checkpoint(arguments.directory)
+    try:
+        prairie = checkpoint.load_prairie()
+    except FileNotFoundError as exc:
+        raise SystemExit(str(exc))
+
+    for failed in checkpoint.failed.values():
+        print('resuming from', failed['name'] + ', which failed:', failed['exception'], file=sys.stderr)
+
+    return execute(prairie, arguments, checkpoint, resume=True)
+
+
+def execute(prairie, arguments, checkpoint: Checkpoint = None, resume: bool = False) -> int:
+    """
+    Run a loaded prairie with the options of the command line and write the values of its output blocks
+
+    :param prairie: Prairie to run
+    :param arguments: parsed arguments of the run or resume command
+    :param checkpoint: Checkpoint recording the outputs of the blocks, None to keep them in memory only
+    :param resume: restore the outputs recorded by checkpoint before running
+    :return: exit code, 1 if a block failed
+    """
+    if arguments.store_bytes is not None:
+        prairie.store = ValueStore(arguments.store_bytes, directory=arguments.store_dir)
+
+    outputs = {}
+
+    def block_done(block, output):
+        if block.type in ('output', 'chart'):
+            outputs[block.id] = {'name': block.name, 'value': output[0] if len(output) == 1 else output}
+
+    def block_failed(block, exception):
+        print(block.name, 'failed:', repr(exception), file=sys.stderr)
+
+    targets = find_targets(prairie, arguments.target)
+    pin_nodes(prairie, arguments.pin)
+
+    cache = ResultCache(arguments.cache_bytes) if arguments.cache_bytes else None
+    disk_cache = DiskCache(arguments.cache_dir, arguments.cache_dir_bytes) if arguments.cache_dir else None
+    if arguments.backend is not None:
+        prairie.backend = arguments.backend
+
+    engine = Engine(prairie, max_workers=arguments.workers, cache=cache, disk_cache=disk_cache,
+                    free_values=arguments.free_values, fuse=arguments.fuse, array_graph=arguments.array_graph,
+                    durations=DurationHistory(arguments.durations),
+                    remote_workers=[parse_address(address) for address in arguments.remote])
+    engine.connect('done', block_done)
+    engine.connect('failed', block_failed)
+
+    trace = None
+    if arguments.trace is not None:
+        trace = Trace()
+        trace.attach(engine)
+
+    if resume:
+        print(checkpoint.restore(engine), 'blocks restored from', checkpoint.directory, file=sys.stderr)
+    if disk_cache is not None:
+        engine.warm_start()
+    # Attached once the outputs are restored, which are already recorded
+    if checkpoint is not None:
+        checkpoint.attach(engine)
+
+    for block in prairie.iter_blocks():
+        if isinstance(block, InputBlock):
+            block.set_ready()
+
+    try:
+        engine.run(targets=targets)
+    finally:
+        engine.shutdown()
+        if trace is not None:
+            trace.save(arguments.trace)
+
+    if arguments.json is None:
+        json.dump(outputs, sys.stdout, default=to_json, indent=2)
+        print()
+    else:
+        with open(arguments.json, 'w') as outfile:
+            json.dump(outputs, outfile, default=to_json)
+
+    if prairie.store is not None:
+        prairie.store.close()
+
+    return 1 if engine.errors else 0
+
+
+def worker(arguments) -> int:
+    try:
+        serve(arguments.host, arguments.port, arguments.workers, arguments.backend)
+    except PermissionError as exc:
+        raise SystemExit(str(exc))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='prairie', description='Run saved prairies without the GUI')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    # Options of the commands running a prairie
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument('--json', metavar='FILE', help='write the outputs to FILE instead of stdout')
+    options.add_argument('--workers', type=int, help='number of worker threads and processes')
+    options.add_argument('--cache-bytes', type=int, metavar='BYTES',
+                         help='cache identical block calls within a memory budget')
+    options.add_argument('--cache-dir', metavar='DIRECTORY', help='keep the block results across runs in DIRECTORY')
+    options.add_argument('--cache-dir-bytes', type=int, default=10 * 1024 ** 3, metavar='BYTES',
+                         help='size limit of the cache directory')
+    options.add_argument('--store-bytes', type=int, metavar='BYTES',
+                         help='keep the large arrays in shared memory within BYTES, spilling the others to disk')
+    options.add_argument('--trace', metavar='FILE',
+                         help='write the events of the run to FILE, in the Chrome trace event format')
+    options.add_argument('--durations', metavar='FILE',
+                         help='keep the execution times of the functions in FILE to schedule the next runs')
+    options.add_argument('--fuse', action='store_true', help='run the linear chains of blocks as single tasks')
+    options.add_argument('--array-graph', action='store_true',
+                         help='count the ready inputs of the blocks in arrays, for very large prairies')
+    options.add_argument('--free-values', action='store_true',
+                         help='free the intermediate values as soon as the blocks using them ran')
+    options.add_argument('--pin', action='append', default=[], metavar='NAME',
+                         help='keep the values of the output nodes of the blocks with this name or id with '
+                              '--free-values, NAME.NODE keeping a single node')
+    options.add_argument('--store-dir', metavar='DIRECTORY', help='directory of the arrays spilled to disk')
+    options.add_argument('--target', action='append', default=[], metavar='NAME',
+                         help='only run the blocks with this name or id and the blocks they depend on')
+    options.add_argument('--backend', choices=['thread', 'process', 'asyncio', 'remote'],
+                         help='backend of the blocks, instead of the one saved in the prairie')
+    options.add_argument('--remote', action='append', default=[], metavar='HOST:PORT',
+                         help='worker daemon running the blocks on the remote backend, as many remote blocks '
+                              'running at the same time as the workers have threads')
+
+    run_parser = commands.add_parser('run', parents=[options], help='run a .yml prairie file')
+    run_parser.add_argument('file', help='prairie file')
+    run_parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                            help='set the value of the input blocks with this name or id')
+    run_parser.add_argument('--sweep', action='append', default=[], metavar='NAME=VALUES',
+                            help='run the prairie once over all the values of the input blocks with this name or id')
+    run_parser.add_argument('--checkpoint', metavar='DIRECTORY',
+                            help='record the outputs of the blocks in the run directory DIRECTORY as they complete')
+    run_parser.set_defaults(function=run)
+
+    resume_parser = commands.add_parser('resume', parents=[options],
+                                        help='resume a run recorded with --checkpoint from the blocks that failed')
+    resume_parser.add_argument('directory', help='run directory')
+    resume_parser.set_defaults(function=resume)
+
+    worker_parser = commands.add_parser('worker', help='run the blocks sent by remote coordinators')
+    worker_parser.add_argument('--host', default='localhost',
+                               help='interface to listen on, another interface than localhost requiring a key in '
+                                    'PRAIRIE_AUTHKEY')
+    worker_parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port to listen on')
+    worker_parser.add_argument('--workers', type=int, help='number of blocks run at the same time')
+    worker_parser.add_argument('--backend', choices=['thread', 'process'], default='thread',
+                               help='backend running the blocks on the worker')
+    worker_parser.set_defaults(function=worker)
+
+    arguments = parser.parse_args(argv)
+    return arguments.function(arguments)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
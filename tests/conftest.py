@@ -0,0 +1,203 @@
+"""
+Helpers shared by the tests, building small prairies in memory and running engines on them
+"""
+
+from multiprocessing.connection import Client
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+
+import pytest
+
+from model.blocks import FunctionBlock, InputBlock, OutputBlock
+from model.core import Prairie
+from model.remote import default_authkey, serve
+
+
+def add_block(prairie, block):
+    prairie.add_block(block)
+    return block
+
+
+def connect(prairie, block_out, block_in, node_out: int = 0, node_in: int = 0):
+    prairie.connect_nodes(list(block_out.nodes_out().values())[node_out],
+                          list(block_in.nodes_in().values())[node_in])
+
+
+def run(engine, timeout: float = 30., **kwargs) -> bool:
+    """
+    Run an engine on a thread, cancelling the run if it does not end within timeout
+
+    :return: weather the run ended by itself
+    """
+    thread = threading.Thread(target=engine.run, kwargs=kwargs, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        engine.cancel()
+        thread.join(timeout)
+        return False
+    return True
+
+
+def write_script(path: str, source: str):
+    """
+    Write a script file, moving its modification time forward so that an edit within the resolution of the file system
+    clock is still seen as one
+    """
+    previous = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    with open(path, 'w') as file:
+        file.write(source)
+    mtime = max(os.stat(path).st_mtime_ns, previous + 10 ** 9)
+    os.utime(path, ns=(mtime, mtime))
+
+
+def linear_prairie(script_file: str, script_function: str, value: str = '1'):
+    """
+    Build the prairie x ---- script_function ---- y
+
+    :return: prairie, input block, output block
+    """
+    prairie = Prairie()
+    x = add_block(prairie, InputBlock('x', value, prairie=prairie))
+    function = add_block(prairie, FunctionBlock(script_file, script_function))
+    y = add_block(prairie, OutputBlock('y'))
+    connect(prairie, x, function)
+    connect(prairie, function, y)
+    return prairie, x, y
+
+
+@pytest.fixture
+def scratch():
+    """
+    Directory for the scripts written by a test. Scripts are imported by their path relative to the root of the
+    repository, so the directory is created within it.
+    """
+    directory = os.path.join('files', 'scratch_' + uuid.uuid4().hex)
+    os.makedirs(directory)
+    yield directory
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def start_worker(max_workers: int) -> tuple:
+    """
+    Start a worker daemon on a free local port, on a daemon thread
+
+    :param max_workers: number of tasks the worker runs at the same time
+    :return: (host, port) of the worker, once it accepts connections
+    """
+    with socket.socket() as probe:
+        probe.bind(('localhost', 0))
+        address = probe.getsockname()
+    threading.Thread(target=serve, args=address, kwargs={'max_workers': max_workers}, daemon=True).start()
+
+    for _ in range(100):
+        try:
+            Client(address, authkey=default_authkey()).close()
+            return address
+        except OSError:
+            time.sleep(0.05)
+    raise ConnectionError('the worker at ' + str(address) + ' did not start')
+
+
+SCRIPT = 'files/scripts/test_functions.py'
+
+
+def example_prairie(backend: str = 'thread'):
+    r"""
+    Build a prairie mixing fan-outs, fan-ins, a function returning two values, a linear chain and a large array:
+
+        a ---- sinus ---- multiply ---- double ---- output_1
+         \               /       \      /    \
+          --- add -------         |     b      -- sinus ---- output_2
+             /                    |
+        b ---                      -- output_3
+
+        a ---- sinus ---- sinus ---- sinus ---- output_4
+
+        c ---- sinus ---- output_5
+
+    :param backend: backend of the blocks
+    :return: Prairie
+    """
+    prairie = Prairie()
+    prairie.backend = backend
+
+    def function(script_function):
+        return add_block(prairie, FunctionBlock(SCRIPT, script_function))
+
+    def output(producer, node_out: int = 0):
+        name = 'output_' + str(sum(block.type == 'output' for block in prairie.iter_blocks()) + 1)
+        connect(prairie, producer, add_block(prairie, OutputBlock(name)), node_out)
+
+    a = add_block(prairie, InputBlock('a', '2.', prairie=prairie))
+    b = add_block(prairie, InputBlock('b', '3.', prairie=prairie))
+    c = add_block(prairie, InputBlock('c', 'np.linspace(0, 1, 300000)', prairie=prairie))
+
+    sinus, add, multiply, double = function('sinus'), function('add'), function('multiply'), function('double')
+    connect(prairie, a, sinus)
+    connect(prairie, a, add)
+    connect(prairie, b, add, node_in=1)
+    connect(prairie, sinus, multiply)
+    connect(prairie, add, multiply, node_in=1)
+    connect(prairie, multiply, double)
+    connect(prairie, b, double, node_in=1)
+    output(double)
+    last = function('sinus')
+    connect(prairie, double, last, node_out=1)
+    output(last)
+    output(multiply)
+
+    previous = a
+    for _ in range(3):
+        last = function('sinus')
+        connect(prairie, previous, last)
+        previous = last
+    output(last)
+
+    last = function('sinus')
+    connect(prairie, c, last)
+    output(last)
+
+    return prairie
+
+
+def run_prairie(prairie, before=None, **kwargs) -> tuple:
+    """
+    Run the blocks of a prairie on a new engine, from its input blocks like the command line runner
+
+    :param prairie: Prairie to run
+    :param before: function called with the engine before the run, such as a warm start
+    :param kwargs: arguments of the Engine
+    :return: engine, and the outputs of the output and chart blocks by block name
+    """
+    from model.engine import Engine
+
+    engine = Engine(prairie, max_workers=kwargs.pop('max_workers', 4), **kwargs)
+    outputs = {}
+    engine.connect('done', lambda block, output: outputs.__setitem__(block.name, output)
+                   if block.type in ('output', 'chart') else None)
+    if before is not None:
+        before(engine)
+    for block in prairie.iter_blocks():
+        if isinstance(block, InputBlock):
+            block.set_ready()
+    try:
+        assert run(engine)
+    finally:
+        engine.shutdown()
+
+    return engine, outputs
+
+
+@pytest.fixture(scope='session')
+def example_outputs():
+    """
+    Outputs of the example prairie run by the plain engine, which the runs with the optional features must give too
+    """
+    engine, outputs = run_prairie(example_prairie())
+    assert not engine.errors and len(outputs) == 5
+    return outputs
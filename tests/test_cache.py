@@ -0,0 +1,80 @@
+"""
+Caches of block results, in memory and on disk. Run from the root of the repository:
+
+    python -m pytest tests
+"""
+
+import os
+
+import numpy as np
+
+from conftest import example_prairie, linear_prairie, run_prairie, write_script
+from model.cache import DiskCache, ResultCache
+
+
+def test_output_found_on_disk_is_not_a_miss(tmp_path):
+    disk_cache = DiskCache(str(tmp_path))
+    disk_cache.put('key', np.arange(3))
+    cache = ResultCache()
+
+    np.testing.assert_array_equal(cache.get('key', fallback=disk_cache), np.arange(3))
+    np.testing.assert_array_equal(cache.get('key', fallback=disk_cache), np.arange(3))
+    assert cache.get('other', 'missing', fallback=disk_cache) == 'missing'
+
+    assert (cache.hits, cache.fallback_hits, cache.misses) == (1, 1, 1)
+
+
+def test_cached_run_matches_plain_run(example_outputs):
+    cache = ResultCache()
+    engine, outputs = run_prairie(example_prairie(), cache=cache)
+    assert not engine.errors
+    np.testing.assert_equal(outputs, example_outputs)
+    misses = cache.misses
+
+    # Every block of the second run is found in the cache
+    engine, outputs = run_prairie(example_prairie(), cache=cache)
+    assert not engine.errors
+    np.testing.assert_equal(outputs, example_outputs)
+    assert cache.misses == misses
+    assert cache.hits >= misses
+
+
+def test_cache_runs_an_edited_script_again(scratch):
+    script_file = os.path.join(scratch, 'scale.py')
+    write_script(script_file, 'def scale(x):\n    return 2*x\n')
+    cache = ResultCache()
+
+    prairie, _, y = linear_prairie(script_file, 'scale', '3')
+    assert run_prairie(prairie, cache=cache)[1]['y'] == [6]
+
+    write_script(script_file, 'def scale(x):\n    return 10*x\n')
+    prairie, _, y = linear_prairie(script_file, 'scale', '3')
+    assert run_prairie(prairie, cache=cache)[1]['y'] == [30]
+
+
+def test_disk_cache_warm_starts_a_new_session(example_outputs, tmp_path):
+    engine, outputs = run_prairie(example_prairie(), disk_cache=DiskCache(str(tmp_path)))
+    assert not engine.errors
+    np.testing.assert_equal(outputs, example_outputs)
+
+    # A new session reads the outputs back from the directory, no block has to run
+    started = []
+    engine, outputs = run_prairie(example_prairie(), disk_cache=DiskCache(str(tmp_path)),
+                                  before=lambda engine: (engine.connect('started', started.append),
+                                                         engine.warm_start()))
+    assert not engine.errors
+    np.testing.assert_equal(outputs, example_outputs)
+    assert not started
+
+
+def test_disk_cache_runs_an_edited_script_again(scratch, tmp_path):
+    script_file = os.path.join(scratch, 'scale.py')
+    write_script(script_file, 'def scale(x):\n    return 2*x\n')
+
+    prairie = linear_prairie(script_file, 'scale', '3')[0]
+    assert run_prairie(prairie, disk_cache=DiskCache(str(tmp_path)))[1]['y'] == [6]
+
+    write_script(script_file, 'def scale(x):\n    return 10*x\n')
+    prairie = linear_prairie(script_file, 'scale', '3')[0]
+    assert run_prairie(prairie, disk_cache=DiskCache(str(tmp_path)),
+                       before=lambda engine: engine.warm_start())[1]['y'] == [30]
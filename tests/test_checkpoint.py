@@ -0,0 +1,48 @@
+"""
+Runs recorded by a Checkpoint and resumed from the blocks that failed. Run from the root of the repository:
+
+    python -m pytest tests
+"""
+
+import os
+
+import numpy as np
+
+from conftest import add_block, connect, example_prairie, run_prairie, write_script
+from model.blocks import FunctionBlock, OutputBlock
+from model.checkpoint import Checkpoint
+
+
+def test_resume_only_runs_the_blocks_that_did_not_finish(example_outputs, scratch, tmp_path):
+    # The example prairie, with multiply ---- flaky ---- output_flaky
+    script_file = os.path.join(scratch, 'unstable.py')
+    # The output nodes are named after the returned value, which the fixed script keeps
+    write_script(script_file, 'def flaky(x):\n    y = x + 1\n    raise RuntimeError(y)\n    return y\n')
+    prairie = example_prairie()
+    multiply = next(block for block in prairie.iter_blocks() if block.name == 'multiply')
+    flaky = add_block(prairie, FunctionBlock(script_file, 'flaky'))
+    connect(prairie, multiply, flaky)
+    connect(prairie, flaky, add_block(prairie, OutputBlock('output_flaky')))
+
+    checkpoint = Checkpoint(str(tmp_path))
+    checkpoint.save_prairie(prairie)
+    engine, outputs = run_prairie(prairie, before=checkpoint.attach)
+    assert list(engine.errors) == [flaky]
+    np.testing.assert_equal(outputs, example_outputs)
+
+    write_script(script_file, 'def flaky(x):\n    y = x + 1\n    return y\n')
+    checkpoint = Checkpoint(str(tmp_path))
+    assert [failed['name'] for failed in checkpoint.failed.values()] == ['flaky']
+    started = []
+
+    def resume(engine):
+        engine.connect('started', lambda block: started.append(block.name))
+        assert checkpoint.restore(engine) > 0
+        checkpoint.attach(engine)
+
+    engine, outputs = run_prairie(checkpoint.load_prairie(), before=resume)
+    assert not engine.errors
+    assert sorted(started) == ['flaky', 'output_flaky']
+    assert outputs.pop('output_flaky') == [outputs['output_3'][0] + 1]
+    np.testing.assert_equal(outputs, example_outputs)
+    assert not checkpoint.failed
@@ -0,0 +1,91 @@
+"""
+Composite blocks, running a saved prairie as a single block. Run from the root of the repository:
+
+    python -m pytest tests
+"""
+
+import os
+
+import numpy as np
+
+from conftest import SCRIPT, add_block, connect, example_prairie, linear_prairie, run, run_prairie, write_script
+from model.blocks import CompositeBlock, FunctionBlock, InputBlock, OutputBlock
+from model.cache import DiskCache, result_key
+from model.composite import load_composite
+from model.core import Prairie
+from model.engine import Engine
+from model.serializer import save_prairie
+
+
+def run_composite(prairie_file: str, disk_cache: DiskCache):
+    # x ---- composite ---- y
+    prairie = Prairie()
+    x = add_block(prairie, InputBlock('x', '3', prairie=prairie))
+    composite = add_block(prairie, CompositeBlock(prairie_file))
+    y = add_block(prairie, OutputBlock('y'))
+    connect(prairie, x, composite)
+    connect(prairie, composite, y)
+
+    engine = Engine(prairie, max_workers=2, disk_cache=disk_cache)
+    done = {}
+    engine.connect('done', lambda block, output: done.__setitem__(block, output))
+    x.set_ready()
+    try:
+        assert run(engine)
+    finally:
+        engine.shutdown()
+
+    assert not engine.errors
+    return done[y][0]
+
+
+def test_cached_composite_runs_again_after_a_script_edit(scratch, tmp_path):
+    script_file = os.path.join(scratch, 'scale.py')
+    prairie_file = os.path.join(scratch, 'scaled.yml')
+    write_script(script_file, 'def scale(x):\n    return 2*x\n')
+    save_prairie(linear_prairie(script_file, 'scale')[0], prairie_file)
+    disk_cache = DiskCache(str(tmp_path))
+
+    key = result_key(prairie_file, 'composite', [3])
+    assert run_composite(prairie_file, disk_cache) == 6
+
+    # Only the script of the sub-prairie changes, not the prairie file
+    write_script(script_file, 'def scale(x):\n    return 10*x\n')
+    assert result_key(prairie_file, 'composite', [3]) != key
+    assert run_composite(prairie_file, disk_cache) == 30
+
+
+def test_composite_matches_plain_run(example_outputs, scratch):
+    # a, b, c ---- example ---- output_1, ..., output_5, the example prairie saved as a composite block
+    prairie_file = os.path.join(scratch, 'example.yml')
+    save_prairie(example_prairie(), prairie_file)
+
+    # The nodes of the composite block follow the order of the blocks in the prairie file
+    signature = load_composite(prairie_file).signature
+    values = {'a': '2.', 'b': '3.', 'c': 'np.linspace(0, 1, 300000)'}
+    prairie = Prairie()
+    composite = add_block(prairie, CompositeBlock(prairie_file))
+    for i, name in enumerate(signature['args']):
+        connect(prairie, add_block(prairie, InputBlock(name, values[name], prairie=prairie)), composite, node_in=i)
+    for i, name in enumerate(signature['returns']):
+        connect(prairie, composite, add_block(prairie, OutputBlock(name)), node_out=i)
+
+    engine, outputs = run_prairie(prairie)
+    assert not engine.errors
+    np.testing.assert_equal(outputs, example_outputs)
+
+
+def test_composite_leaves_out_the_blocks_no_output_depends_on(scratch):
+    # x ---- sinus ---- y
+    #   \
+    #    -- fail
+    script_file = os.path.join(scratch, 'fail.py')
+    write_script(script_file, 'def fail(x):\n    raise RuntimeError(x)\n    return x\n')
+    prairie, x, _ = linear_prairie(SCRIPT, 'sinus')
+    connect(prairie, x, add_block(prairie, FunctionBlock(script_file, 'fail')))
+    prairie_file = os.path.join(scratch, 'dead_branch.yml')
+    save_prairie(prairie, prairie_file)
+
+    composite = load_composite(prairie_file)
+    assert [script_function for _, script_function, _ in composite.steps] == ['sinus']
+    assert composite(1.) == np.sin(1.)
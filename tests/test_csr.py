@@ -0,0 +1,54 @@
+"""
+Runs counting the ready inputs in an ArrayGraph, against the same runs counting them on the nodes. Run from the root
+of the repository:
+
+    python -m pytest tests
+"""
+
+import numpy as np
+
+from conftest import example_prairie, run
+from model.blocks import InputBlock
+from model.engine import Engine
+from prairie import set_inputs
+
+
+def run_twice(array_graph: bool) -> list:
+    """
+    Run the example prairie, then again incrementally after changing the input block b
+
+    :return: outputs by block name, and sorted names of the blocks started, of each run
+    """
+    prairie = example_prairie()
+    engine = Engine(prairie, max_workers=4, array_graph=array_graph)
+    outputs, started = {}, []
+    engine.connect('done', lambda block, output: outputs.__setitem__(block.name, output)
+                   if block.type == 'output' else None)
+    engine.connect('started', lambda block: started.append(block.name))
+
+    runs = []
+    try:
+        for assignments in ([], ['b=4.']):
+            set_inputs(prairie, assignments)
+            for block in prairie.iter_blocks():
+                if isinstance(block, InputBlock):
+                    block.set_ready()
+            assert run(engine)
+            assert not engine.errors
+            runs.append((dict(outputs), sorted(started)))
+            outputs.clear()
+            started.clear()
+    finally:
+        engine.shutdown()
+
+    return runs
+
+
+def test_array_graph_matches_object_graph(example_outputs):
+    runs = run_twice(array_graph=False)
+    array_runs = run_twice(array_graph=True)
+
+    np.testing.assert_equal(runs[0][0], example_outputs)
+    np.testing.assert_equal(array_runs, runs)
+    # Only the blocks downstream of b run again
+    assert runs[1][1] == ['add', 'b', 'double', 'multiply', 'output_1', 'output_2', 'output_3', 'sinus']
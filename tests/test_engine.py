@@ -0,0 +1,155 @@
+"""
+Runs of the engine on small prairies built in memory. Run from the root of the repository:
+
+    python -m pytest tests
+"""
+
+import numpy as np
+
+from conftest import add_block, connect, run, start_worker
+from model.blocks import FunctionBlock, InputBlock, OutputBlock
+from model.core import Prairie
+from model.engine import Engine
+from prairie import pin_nodes
+
+SCRIPT = 'files/scripts/test_functions.py'
+
+
+def test_targets_run_through_a_stream_fanning_out():
+    # n ---- chunks ---- sinus ---- output_1
+    #                \
+    #                 -- sinus ---- output_2
+    prairie = Prairie()
+    n = add_block(prairie, InputBlock('n', '20', prairie=prairie))
+    chunks = add_block(prairie, FunctionBlock(SCRIPT, 'chunks'))
+    outputs = []
+    for i in (1, 2):
+        sinus = add_block(prairie, FunctionBlock(SCRIPT, 'sinus'))
+        output = add_block(prairie, OutputBlock('output_' + str(i)))
+        connect(prairie, chunks, sinus)
+        connect(prairie, sinus, output)
+        outputs.append(output)
+    connect(prairie, n, chunks)
+
+    engine = Engine(prairie, max_workers=4, stream_buffer=2)
+    done = {}
+    engine.connect('done', lambda block, output: done.__setitem__(block, output))
+    n.set_ready()
+    try:
+        assert run(engine, targets=[outputs[0]])
+    finally:
+        engine.shutdown()
+
+    assert not engine.errors
+    assert np.shape(done[outputs[0]][0]) == (20 * 1000,)
+    assert outputs[1] not in done
+    assert outputs[1].dirty
+
+
+def test_asyncio_blocks_are_not_throttled():
+    # 1. ---- wait ---- output_wait          0.05 ---- async_wait ---- output_async_wait
+    prairie = Prairie()
+    inputs, outputs = [], {}
+    for function, value in (('wait', '1.'), ('async_wait', '0.05')):
+        x = add_block(prairie, InputBlock('x', value, prairie=prairie))
+        block = add_block(prairie, FunctionBlock(SCRIPT, function))
+        outputs[function] = add_block(prairie, OutputBlock('output_' + function))
+        connect(prairie, x, block)
+        connect(prairie, block, outputs[function])
+        inputs.append(x)
+
+    # The only worker is taken by wait first, async_wait does not need it
+    engine = Engine(prairie, max_workers=1)
+    done = []
+    engine.connect('done', lambda block, output: done.append(block))
+    for x in inputs:
+        x.set_ready()
+    try:
+        assert run(engine)
+    finally:
+        engine.shutdown()
+
+    assert not engine.errors
+    assert done.index(outputs['async_wait']) < done.index(outputs['wait'])
+
+
+def test_remote_blocks_are_throttled_to_the_worker_threads():
+    # 0.2 ---- wait ---- output_1          0.2 ---- wait ---- output_2
+    prairie = Prairie()
+    prairie.backend = 'remote'
+    inputs = []
+    for i in (1, 2):
+        x = add_block(prairie, InputBlock('x', '0.2', prairie=prairie))
+        block = add_block(prairie, FunctionBlock(SCRIPT, 'wait'))
+        output = add_block(prairie, OutputBlock('output_' + str(i)))
+        connect(prairie, x, block)
+        connect(prairie, block, output)
+        inputs.append(x)
+
+    # The engine has 4 workers, the remote worker only 1 thread
+    engine = Engine(prairie, max_workers=4, remote_workers=[start_worker(1)])
+    events = []
+    for event in ('started', 'done'):
+        engine.connect(event, lambda block, *_, event=event: events.append((event, block)))
+    for x in inputs:
+        x.set_ready()
+    try:
+        assert run(engine)
+    finally:
+        engine.shutdown()
+
+    assert not engine.errors
+    running = 0
+    for event, block in events:
+        running += 1 if event == 'started' else -1
+        assert running <= 1
+
+
+def test_fused_chain_reports_its_blocks_one_after_the_other():
+    # 1. ---- sinus ---- sinus ---- sinus ---- output
+    prairie = Prairie()
+    x = add_block(prairie, InputBlock('x', '1.', prairie=prairie))
+    previous = x
+    for _ in range(3):
+        block = add_block(prairie, FunctionBlock(SCRIPT, 'sinus'))
+        connect(prairie, previous, block)
+        previous = block
+    connect(prairie, previous, add_block(prairie, OutputBlock('output')))
+
+    engine = Engine(prairie, max_workers=4, fuse=True)
+    events = []
+    for event in ('started', 'done'):
+        engine.connect(event, lambda block, *_, event=event: events.append((event, block)))
+    x.set_ready()
+    try:
+        assert run(engine)
+    finally:
+        engine.shutdown()
+
+    assert not engine.errors
+    assert engine.find_chains(prairie.plan())
+    assert events == [(event, block) for block in [block for event, block in events if event == 'done']
+                      for event in ('started', 'done')]
+
+
+def test_free_values_keeps_the_pinned_nodes():
+    # 1. ---- first ---- second ---- output
+    prairie = Prairie()
+    x = add_block(prairie, InputBlock('x', '1.', prairie=prairie))
+    first = add_block(prairie, FunctionBlock(SCRIPT, 'sinus'))
+    first.name = 'first'
+    second = add_block(prairie, FunctionBlock(SCRIPT, 'sinus'))
+    connect(prairie, x, first)
+    connect(prairie, first, second)
+    connect(prairie, second, add_block(prairie, OutputBlock('output')))
+    pin_nodes(prairie, ['first'])
+
+    engine = Engine(prairie, max_workers=2, free_values=True)
+    x.set_ready()
+    try:
+        assert run(engine)
+    finally:
+        engine.shutdown()
+
+    assert not engine.errors
+    assert list(first.nodes_out().values())[0].value == np.sin(1.)
@@ -0,0 +1,48 @@
+"""
+Linear chains of blocks fused into single tasks, against the same prairies run block by block. Run from the root of
+the repository:
+
+    python -m pytest tests
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from conftest import SCRIPT, add_block, connect, example_prairie, run_prairie, write_script
+from model.blocks import FunctionBlock, InputBlock, OutputBlock
+from model.core import Prairie
+
+
+@pytest.mark.parametrize('backend', ['thread', 'process'])
+def test_fused_run_matches_plain_run(example_outputs, backend):
+    prairie = example_prairie(backend)
+    engine, outputs = run_prairie(prairie, fuse=True)
+
+    assert not engine.errors
+    assert engine.find_chains(prairie.plan())
+    np.testing.assert_equal(outputs, example_outputs)
+
+
+def test_failing_step_stops_its_chain(scratch):
+    # 1. ---- sinus ---- fail ---- sinus ---- output
+    script_file = os.path.join(scratch, 'fail.py')
+    write_script(script_file, 'def fail(x):\n    raise ValueError(x)\n')
+    prairie = Prairie()
+    x = add_block(prairie, InputBlock('x', '1.', prairie=prairie))
+    chain = [FunctionBlock(SCRIPT, 'sinus'), FunctionBlock(script_file, 'fail'), FunctionBlock(SCRIPT, 'sinus')]
+    previous = x
+    for block in chain + [OutputBlock('output')]:
+        connect(prairie, previous, add_block(prairie, block))
+        previous = block
+
+    done = []
+    engine, _ = run_prairie(prairie, fuse=True, before=lambda engine: engine.connect(
+        'done', lambda block, output: done.append(block)))
+
+    assert engine.find_chains(prairie.plan())
+    assert list(engine.errors) == [chain[1]]
+    assert isinstance(engine.errors[chain[1]], ValueError)
+    assert chain[0] in done and not chain[0].dirty
+    assert chain[2] not in done and chain[2].dirty
@@ -0,0 +1,33 @@
+"""
+Runs of the engine on worker daemons, against the plain engine. Run from the root of the repository:
+
+    python -m pytest tests
+"""
+
+import socket
+import time
+
+import numpy as np
+
+from conftest import example_prairie, run_prairie, start_worker
+
+
+def test_remote_run_matches_plain_run(example_outputs):
+    engine, outputs = run_prairie(example_prairie('remote'), remote_workers=[start_worker(2)])
+
+    assert not engine.errors
+    np.testing.assert_equal(outputs, example_outputs)
+
+
+def test_unreachable_worker_fails_the_blocks():
+    with socket.socket() as probe:
+        probe.bind(('localhost', 0))
+        address = probe.getsockname()
+
+    start = time.perf_counter()
+    engine, outputs = run_prairie(example_prairie('remote'), remote_workers=[address])
+
+    assert time.perf_counter() - start < 10.
+    assert not outputs
+    assert engine.errors
+    assert all(isinstance(exc, ConnectionError) for exc in engine.errors.values())
@@ -0,0 +1,28 @@
+"""
+Node values kept in shared memory and spilled to disk by a ValueStore. Run from the root of the repository:
+
+    python -m pytest tests
+"""
+
+import numpy as np
+
+from conftest import example_prairie, run_prairie
+from model.store import StoredArray, ValueStore
+
+
+def test_stored_run_matches_plain_run(example_outputs, tmp_path):
+    prairie = example_prairie()
+    # Room in shared memory for one of the arrays of 2.4 MB only, the other one is spilled to disk
+    prairie.store = ValueStore(memory_bytes=3 * 1024 ** 2, directory=str(tmp_path))
+    try:
+        engine, outputs = run_prairie(prairie)
+        assert not engine.errors
+        np.testing.assert_equal(outputs, example_outputs)
+
+        c = next(block for block in prairie.iter_blocks() if block.name == 'c')
+        node = list(c.nodes_out().values())[0]
+        assert isinstance(node._value, StoredArray)
+        assert prairie.store.spilled_bytes > 0
+        np.testing.assert_array_equal(node.value, np.linspace(0, 1, 300000))
+    finally:
+        prairie.store.close()
@@ -0,0 +1,43 @@
+"""
+Sweeps of vectorizable functions, which receive whole batches, against the same sweeps called once per element. Run
+from the root of the repository:
+
+    python -m pytest tests
+"""
+
+import numpy as np
+import pytest
+
+from model.backends import ThreadBackend
+from model.sweep import submit_batch
+
+SCRIPT = 'files/scripts/test_functions.py'
+
+
+@pytest.fixture
+def backend():
+    backend = ThreadBackend(2)
+    yield backend
+    backend.shutdown()
+
+
+@pytest.mark.parametrize('function, args, batched', [
+    ('add', [[1, 2], np.array([10, 20])], [True, False]),
+    ('sub', [[1, 2], np.array([10, 20])], [True, False]),
+    ('add', [[1, 2], np.array([10, 20, 30])], [True, False]),
+    ('multiply', [np.array([1., 2., 3.]), 2.], [True, False]),
+    ('add', [[1, 2], [10, 20]], [True, True]),
+    ('add', [np.arange(6).reshape(3, 2), np.array([[1, 2], [3, 4]])], [True, False]),
+    ('sinus', [[0., 1., 2.]], [True]),
+])
+def test_vectorized_matches_fan_out(backend, function, args, batched):
+    vectorized = submit_batch(backend, SCRIPT, function, args, batched, True).result()
+    fanned_out = submit_batch(backend, SCRIPT, function, args, batched, False).result()
+
+    np.testing.assert_array_equal(vectorized, fanned_out)
+
+
+def test_sweep_does_not_broadcast_against_unbatched_array(backend):
+    output = submit_batch(backend, SCRIPT, 'add', [[1, 2], np.array([10, 20])], [True, False], True).result()
+
+    np.testing.assert_array_equal(output, [[11, 21], [12, 22]])
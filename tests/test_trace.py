@@ -0,0 +1,44 @@
+"""
+Traces of engine runs, the block executions being laid out on the lanes of the workers that ran them. Run from the
+root of the repository:
+
+    python -m pytest tests
+"""
+
+from conftest import add_block, connect, run
+from model.blocks import FunctionBlock, InputBlock, OutputBlock
+from model.core import Prairie
+from model.engine import Engine
+from model.trace import Trace
+
+SCRIPT = 'files/scripts/test_functions.py'
+
+
+def test_fused_chain_runs_one_block_after_the_other_on_one_worker():
+    # 0.05 ---- wait ---- wait ---- wait ---- output
+    prairie = Prairie()
+    x = add_block(prairie, InputBlock('x', '0.05', prairie=prairie))
+    previous, chain = x, []
+    for _ in range(3):
+        block = add_block(prairie, FunctionBlock(SCRIPT, 'wait'))
+        connect(prairie, previous, block)
+        previous = block
+        chain.append(block)
+    connect(prairie, previous, add_block(prairie, OutputBlock('output')))
+
+    engine = Engine(prairie, max_workers=4, fuse=True)
+    trace = Trace()
+    trace.attach(engine)
+    x.set_ready()
+    try:
+        assert run(engine)
+    finally:
+        engine.shutdown()
+
+    assert not engine.errors
+    slices = {event['args']['block']: event for event in trace.to_dict()['traceEvents'] if event['ph'] == 'X'}
+    steps = [slices[block.id] for block in chain]
+    assert len({step['tid'] for step in steps}) == 1
+    for step, following in zip(steps, steps[1:]):
+        assert step['dur'] >= 0.05 * 1e6
+        assert following['ts'] >= step['ts'] + step['dur'] - 1
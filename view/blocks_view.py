@@ -21,6 +21,7 @@ class BlockView(QGraphicsItemGroup):
     INACTIVE_COLOR = [170, 170, 170, 255]
     ACTIVE_COLOR = [84, 179, 235, 255]
     ERROR_COLOR = [221, 182, 104, 255]
+    CANCELLED_COLOR = [150, 120, 190, 255]
 
     NODES_IN_POSITIONS = [[3 / N],
                           [4 / N, 2 / N],
@@ -215,6 +216,10 @@ class BlockView(QGraphicsItemGroup):
         else:
             self.state = 'error'
 
+    def thread_cancelled(self):
+        # The block was running when the run has been cancelled, its output is not up to date
+        self.state = 'cancelled'
+
     def to_pixmap(self) -> QPixmap:
 
         rect = self.boundingRect().toRect()
@@ -261,6 +266,8 @@ class BlockView(QGraphicsItemGroup):
             pen_color = QColor(*self.ACTIVE_COLOR)
         elif self.state == 'error':
             pen_color = QColor(*self.ERROR_COLOR)
+        elif self.state == 'cancelled':
+            pen_color = QColor(*self.CANCELLED_COLOR)
         elif self.state == 'selected':
             pen_color = QColor(*self.INACTIVE_COLOR).darker(170)
         else:
@@ -524,6 +531,16 @@ class FunctionBlockView(BlockView):
         self.create_nodes(nodes_dict, 'out')
 
 
+class CompositeBlockView(FunctionBlockView):
+
+    def __init__(self, name, nodes_dict, position=-1, parent=None, block_id=None, preview=False):
+        # A whole sub-prairie, drawn as a single block
+        super(CompositeBlockView, self).__init__(name, nodes_dict, position=position, parent=parent,
+                                                 block_id=block_id, preview=preview)
+
+        self.type = 'composite'
+
+
 class ChartBlockView(BlockView):
 
     def __init__(self, name, nodes_dict, position=-1, parent=None, block_id=None, preview=False):
@@ -70,6 +70,14 @@ class Tree(QTreeWidget):
         mime_datas = []
 
         for item in items:
+            if isinstance(item, TreeItem) and item.type == 'prairie':
+
+                mime_data = QMimeData()
+                mime_data.setText(json.dumps({'type': 'composite',
+                                              'prairie_file': item.path,
+                                              'object': 'block'}))
+                mime_datas.append(mime_data)
+
             if isinstance(item, TreeItem) and item.type == 'function':
 
                 if item.function_name == 'input':
@@ -134,6 +142,10 @@ class TreeItem(QTreeWidgetItem):
         elif os.path.isfile(self.path) and self.path.endswith('.py'):
             self.type = 'file'
             self.setIcon(0, QIcon('resources/icons/file.png'))
+        elif os.path.isfile(self.path) and self.path.endswith('.yml'):
+            # Dropped as a composite block
+            self.type = 'prairie'
+            self.setIcon(0, QIcon('resources/icons/file.png'))
         else:
             self.type = 'function'
             self.setIcon(0, QIcon('resources/icons/function.png'))